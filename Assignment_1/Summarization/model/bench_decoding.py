@@ -0,0 +1,95 @@
+"""Benchmark of summary decoding speed.
+
+Compares the original per-token Model.predict loop with the compiled
+single-step decoder (one article at a time and in batches, greedy and beam
+search). The model has random weights and <end> is never emitted, so every
+summary is decoded to its full length and all paths do the same work.
+
+Run from the model directory:
+    python bench_decoding.py
+    python bench_decoding.py --articles 256 --batch-size 64 --summary-len 100 --vocab 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from seq2seq_model import Seq2SeqSummarizer
+
+
+def predict_loop(model, input_seq, max_summary_length, start_index):
+    """The original decoding loop: one Model.predict call per token."""
+    states_value = model.encoder.predict(input_seq, verbose=0)
+    target_seq = np.array([[start_index]])
+    summary = []
+    for _ in range(max_summary_length):
+        output_tokens, h, c = model.decoder.predict([target_seq] + list(states_value), verbose=0)
+        sampled_token_index = np.argmax(output_tokens[0, -1, :])
+        summary.append(sampled_token_index)
+        target_seq = np.array([[sampled_token_index]])
+        states_value = [h, c]
+    return summary
+
+
+def report(name, articles, summary_len, seconds):
+    tokens = articles * summary_len
+    print(f"{name:<32}{tokens / seconds:>12.1f}{seconds / articles * 1000:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=64, help="Articles to summarise")
+    parser.add_argument("--loop-articles", type=int, default=4, help="Articles for the (slow) Model.predict loop")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--text-len", type=int, default=400)
+    parser.add_argument("--summary-len", type=int, default=100)
+    parser.add_argument("--vocab", type=int, default=20000)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--latent-dim", type=int, default=512)
+    parser.add_argument("--beam-width", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = Seq2SeqSummarizer(args.vocab, args.embedding_dim, args.latent_dim)
+    model.build_model()
+    rng = np.random.default_rng(args.seed)
+    inputs = rng.integers(1, args.vocab, size=(args.articles, args.text_len))
+
+    start_index = args.vocab - 1
+    # An index the decoder can never produce, so no summary ends early
+    word_to_index = {'<start>': start_index, '<end>': -1}
+    index_to_word = {i: f"w{i}" for i in range(args.vocab)}
+
+    def decode(articles, batch_size, beam_width=1):
+        for start in range(0, articles, batch_size):
+            model.predict_batch(
+                inputs[start:start + batch_size], args.summary_len, word_to_index, index_to_word,
+                beam_width=beam_width
+            )
+
+    # Warm-up, so tracing and the first Model.predict set-up are not measured
+    predict_loop(model, inputs[:1], 2, start_index)
+    decode(1, 1)
+    decode(args.batch_size, args.batch_size, args.beam_width)
+
+    print(f"{'decoder':<32}{'tokens/s':>12}{'ms/summary':>16}")
+    start = time.perf_counter()
+    for i in range(args.loop_articles):
+        predict_loop(model, inputs[i:i + 1], args.summary_len, start_index)
+    report("Model.predict loop", args.loop_articles, args.summary_len, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    decode(args.loop_articles, 1)
+    report("step function, batch 1", args.loop_articles, args.summary_len, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    decode(args.articles, args.batch_size)
+    report(f"step function, batch {args.batch_size}", args.articles, args.summary_len, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    decode(args.articles, args.batch_size, args.beam_width)
+    report(f"beam {args.beam_width}, batch {args.batch_size}", args.articles, args.summary_len, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
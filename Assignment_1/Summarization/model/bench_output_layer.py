@@ -0,0 +1,99 @@
+"""Benchmark of the output layer: full softmax, capped vocabulary and sampled softmax.
+
+Measures the training step time and decoder step time of the model for
+each configuration, and the peak memory of the process that ran it. Each
+configuration runs in its own process, so the peak memory figures do not
+include each other.
+
+    full      full softmax over --vocab words (the default model)
+    capped    full softmax over the --max-vocab most frequent words plus <unk>
+    sampled   sampled softmax over --vocab words, --num-sampled words per step
+
+Run from the model directory:
+    python bench_output_layer.py
+    python bench_output_layer.py --vocab 100000 --max-vocab 20000 --num-sampled 512 --batch-size 64
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+
+def run_config(name, vocab_size, args):
+    # Imported here, so each configuration starts from a fresh TensorFlow
+    import numpy as np
+    import tensorflow as tf
+
+    from seq2seq_model import Seq2SeqSummarizer
+
+    model = Seq2SeqSummarizer(vocab_size, args.embedding_dim, args.latent_dim)
+    model.build_model()
+    rng = np.random.default_rng(args.seed)
+    encoder_input = rng.integers(1, vocab_size, size=(args.batch_size, args.text_len), dtype=np.int32)
+    decoder_input = rng.integers(1, vocab_size, size=(args.batch_size, args.summary_len), dtype=np.int32)
+    decoder_target = rng.integers(1, vocab_size, size=(args.batch_size, args.summary_len), dtype=np.int32)
+
+    if name == 'sampled':
+        train_step = model._build_sampled_train_step(args.num_sampled)
+        inputs = (tf.constant(encoder_input), tf.constant(decoder_input))
+        targets = tf.constant(decoder_target)
+
+        def step():
+            float(train_step(inputs, targets))
+    else:
+        def step():
+            model.model.train_on_batch([encoder_input, decoder_input], decoder_target)
+
+    # Warm-up, so tracing is not measured
+    step()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    train_ms = (time.perf_counter() - start) / args.steps * 1000
+
+    # Decoding scores the whole output layer at every step, whichever loss trained it
+    h, c = model._encode_fn(tf.constant(encoder_input))
+    tokens = tf.ones([args.batch_size], dtype=tf.int32)
+    token_bias = tf.zeros([vocab_size])
+    model._greedy_step_fn(tokens, h, c, token_bias)
+    start = time.perf_counter()
+    for _ in range(args.summary_len):
+        tokens, h, c = model._greedy_step_fn(tokens, h, c, token_bias)
+    tokens.numpy()
+    decode_ms = (time.perf_counter() - start) / args.summary_len * 1000
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return train_ms, decode_ms, peak_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocab", type=int, default=50000, help="Full vocabulary size")
+    parser.add_argument("--max-vocab", type=int, default=10000, help="Words kept by the capped configuration")
+    parser.add_argument("--num-sampled", type=int, default=512, help="Sampled words per step")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--text-len", type=int, default=400)
+    parser.add_argument("--summary-len", type=int, default=100)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--latent-dim", type=int, default=512)
+    parser.add_argument("--steps", type=int, default=5, help="Training steps to time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configs = [
+        ('full', args.vocab),
+        # The kept words plus padding, <unk>, <start> and <end>
+        ('capped', args.max_vocab + 4),
+        ('sampled', args.vocab),
+    ]
+    context = multiprocessing.get_context('spawn')
+    print(f"{'output layer':<14}{'vocab':>10}{'train ms/step':>16}{'decode ms/step':>16}{'peak MB':>10}")
+    for name, vocab_size in configs:
+        with context.Pool(1) as pool:
+            train_ms, decode_ms, peak_mb = pool.apply(run_config, (name, vocab_size, args))
+        print(f"{name:<14}{vocab_size:>10}{train_ms:>16.1f}{decode_ms:>16.2f}{peak_mb:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
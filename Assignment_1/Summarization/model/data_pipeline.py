@@ -0,0 +1,125 @@
+"""Streaming tf.data input pipeline for training the summarizer.
+
+Examples are read from the data files one at a time and tokenised once, in
+parallel, into a SequenceStore (cached on disk and memory-mapped when the
+DataProcessor has a cache_dir). Each epoch streams slices of the stored
+sequences and pads them per batch, so memory use does not grow with the
+corpus. Batches are bucketed by article length, so short articles are not
+padded to max_text_len. The next batches are prepared while the model trains.
+
+Data files are JSON Lines (.jsonl, one {"text": ..., "summary": ...}
+object per line) or JSON (.json, one such object or a list of them). A
+.jsonl file is streamed line by line; a .json file has to be parsed whole,
+so use JSON Lines for large corpora.
+"""
+import hashlib
+import json
+import os
+import zlib
+
+import tensorflow as tf
+
+# Article lengths (in tokens) at which a new bucket starts
+DEFAULT_BUCKET_BOUNDARIES = [50, 100, 150, 200, 300]
+
+
+def list_data_files(data_dir):
+    """List the .json and .jsonl files of a directory, in name order."""
+    return [
+        os.path.join(data_dir, filename)
+        for filename in sorted(os.listdir(data_dir))
+        if filename.endswith(('.json', '.jsonl'))
+    ]
+
+
+def hash_files(paths):
+    """SHA-256 of the names and contents of data files, as a hex string."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def iter_examples(paths, split=None, validation_split=0.2):
+    """Yield (text, summary) pairs from data files, one example at a time.
+
+    With split='train' or split='validation', only the examples of that
+    split are yielded. Examples are assigned by a hash of their text, so
+    the split does not depend on file order and is the same on every pass.
+    """
+    for path in paths:
+        with open(path, 'r') as f:
+            if path.endswith('.jsonl'):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                data = json.load(f)
+                records = data if isinstance(data, list) else [data]
+
+            for record in records:
+                text, summary = record['text'], record['summary']
+                if split is not None:
+                    is_validation = zlib.crc32(text.encode('utf-8')) % 1000 < validation_split * 1000
+                    if is_validation != (split == 'validation'):
+                        continue
+                yield text, summary
+
+
+def iter_texts(paths, split=None, validation_split=0.2):
+    """Yield the articles and summaries of the data files, for fitting the tokenizer and tokenising."""
+    for text, summary in iter_examples(paths, split, validation_split):
+        yield text
+        yield summary
+
+
+def tokenize_files(processor, paths, split=None, validation_split=0.2, files_hash=None):
+    """Tokenise the examples of data files once, in parallel.
+
+    Returns a SequenceStore holding each article followed by its summary.
+    processor must have a fitted tokenizer. With a processor cache_dir, the
+    sequences are cached on disk, keyed by files_hash (see hash_files,
+    computed here when not given) and the split.
+    """
+    if processor.cache_dir and files_hash is None:
+        files_hash = hash_files(paths)
+    cache_key = f"{files_hash}:{split}:{validation_split}" if files_hash else None
+    return processor.texts_to_sequences(iter_texts(paths, split, validation_split), cache_key=cache_key)
+
+
+def make_dataset(processor, sequences, batch_size=32,
+                 bucket_boundaries=DEFAULT_BUCKET_BOUNDARIES, shuffle_buffer=1000):
+    """Build a dataset of ((encoder_input, decoder_input), decoder_target) batches.
+
+    sequences is a SequenceStore from tokenize_files. The sequences are the
+    same as those of DataProcessor.prepare_sequences, but each batch is only
+    padded to its own longest article and summary.
+    """
+    def generate():
+        for i in range(0, len(sequences), 2):
+            yield processor.encode_sequences(sequences[i], sequences[i + 1])
+
+    sequence_spec = tf.TensorSpec(shape=(None,), dtype=tf.int32)
+    dataset = tf.data.Dataset.from_generator(
+        generate,
+        output_signature=(sequence_spec, sequence_spec, sequence_spec)
+    )
+
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer)
+
+    boundaries = [b for b in bucket_boundaries if b < processor.max_text_len]
+    dataset = dataset.bucket_by_sequence_length(
+        element_length_func=lambda encoder_input, decoder_input, decoder_target: tf.shape(encoder_input)[0],
+        bucket_boundaries=boundaries,
+        bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+        padded_shapes=([None], [None], [None])
+    )
+
+    dataset = dataset.map(
+        lambda encoder_input, decoder_input, decoder_target: ((encoder_input, decoder_input), decoder_target),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -1,17 +1,84 @@
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import tempfile
+import uuid
 import numpy as np
-from tensorflow.keras.preprocessing.text import Tokenizer
+from tensorflow.keras.preprocessing.text import Tokenizer, tokenizer_from_json
 from tensorflow.keras.preprocessing.sequence import pad_sequences
 import nltk
 from nltk.tokenize import sent_tokenize, word_tokenize
 import re
+from text_workers import count_chunk, init_tokenizer, run_chunk, tokenize_chunk, tokenizer_state
+
+# Texts per task sent to a worker process
+DEFAULT_CHUNK_SIZE = 1000
+# Worker processes at most by default; each one imports the main module (and
+# so usually TensorFlow) again when it starts
+DEFAULT_NUM_WORKERS = 4
+
+def hash_texts(texts):
+    """SHA-256 of a list of texts, as a hex string."""
+    digest = hashlib.sha256()
+    for text in texts:
+        data = text.encode('utf-8')
+        # The length keeps ['ab', 'c'] and ['a', 'bc'] apart
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+class SequenceStore:
+    """Integer sequences stored as one flat array plus offsets.
+    
+    store[i] is the i-th sequence, a slice of the flat array. The flat
+    array may be memory-mapped, so only the sequences read are loaded.
+    """
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
 
 class DataProcessor:
-    def __init__(self, max_text_len=400, max_summary_len=100):
+    def __init__(self, max_text_len=400, max_summary_len=100, max_vocab_size=None,
+                 cache_dir=None, num_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Set up the tokenizer and preprocessing options.
+        
+        max_vocab_size keeps only the most frequent words; the others become
+        <unk>. With cache_dir, the fitted tokenizer and the integer sequences
+        are cached on disk, keyed by a hash of the corpus (and tokenizer), so
+        the same corpus is not tokenised again. Fitting the tokenizer and
+        tokenisation run in num_workers processes (up to DEFAULT_NUM_WORKERS
+        by default, 1 to disable), chunk_size texts at a time. The workers
+        are started on first use and kept until close().
+        """
         self.max_text_len = max_text_len
         self.max_summary_len = max_summary_len
-        self.tokenizer = Tokenizer(filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n')
+        self.max_vocab_size = max_vocab_size
+        self.cache_dir = cache_dir
+        self.num_workers = num_workers or min(DEFAULT_NUM_WORKERS, os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self._pool = None
+        if max_vocab_size:
+            # Index 0 is padding and index 1 is <unk>, then the kept words
+            self.tokenizer = Tokenizer(
+                num_words=max_vocab_size + 2,
+                oov_token='<unk>',
+                filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+            )
+        else:
+            self.tokenizer = Tokenizer(filters='!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n')
         self.word_to_index = None
         self.index_to_word = None
+        self.vocab_size = None
         
     def preprocess_text(self, text):
         """Clean and preprocess text."""
@@ -26,37 +93,222 @@ class DataProcessor:
         
         return text
     
+    def _chunks(self, texts):
+        """Split an iterable of texts into lists of chunk_size texts."""
+        texts = iter(texts)
+        while True:
+            chunk = list(itertools.islice(texts, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _map_chunks(self, function, chunks, state=None):
+        """Apply a text_workers chunk function to chunks over a process pool.
+        
+        Yields the results in order. Chunks are sent to the workers a few
+        at a time, so an iterable of chunks is never held in memory whole.
+        """
+        chunks = iter(chunks)
+        window_size = 2 * self.num_workers
+        window = list(itertools.islice(chunks, window_size))
+        if self.num_workers == 1 or len(window) <= 1:
+            init_tokenizer(state)
+            for chunk in itertools.chain(window, chunks):
+                yield function(chunk)
+            return
+        
+        # The workers read the state from a file once per call, instead of
+        # receiving it (the whole word index) with every chunk. The unique
+        # name tells them when to read it again.
+        fd, state_path = tempfile.mkstemp(prefix=f'tokenizer-state-{uuid.uuid4().hex}-', suffix='.pkl')
+        
+        def tasks(window):
+            return [(function, state_path, chunk) for chunk in window]
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(state, f)
+            pool = self._get_pool()
+            pending = pool.map_async(run_chunk, tasks(window))
+            while pending is not None:
+                results = pending.get()
+                # The workers process the next window while these results are used
+                window = list(itertools.islice(chunks, window_size))
+                pending = pool.map_async(run_chunk, tasks(window)) if window else None
+                yield from results
+        finally:
+            os.remove(state_path)
+    
+    def _get_pool(self):
+        """Start the worker processes, once per DataProcessor."""
+        if self._pool is None:
+            # Forking a process that has started TensorFlow is unsafe, so the
+            # workers are spawned. A spawned worker imports the main module again
+            # (train.py imports TensorFlow), which takes a few seconds and a few
+            # hundred MB per worker; the text_workers code it runs does not need it.
+            context = multiprocessing.get_context('spawn')
+            self._pool = context.Pool(self.num_workers)
+        return self._pool
+    
+    def close(self):
+        """Shut down the worker processes. They are started again if needed."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+    
+    def _cache_path(self, prefix, cache_key, suffix):
+        """Path of a cache file for cache_key and the current tokenizer."""
+        key = hashlib.sha256((cache_key + self.tokenizer.to_json()).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{prefix}-{key[:32]}{suffix}")
+    
     def fit_tokenizer(self, texts, summaries):
         """Fit tokenizer on texts and summaries."""
         # Combine texts and summaries for vocabulary
         all_texts = texts + summaries
+        return self.fit_tokenizer_on_stream(all_texts, cache_key=hash_texts(all_texts))
+    
+    def fit_tokenizer_on_stream(self, texts, cache_key=None):
+        """Fit tokenizer on an iterable of texts, counting words in parallel.
         
-        # Fit tokenizer
-        self.tokenizer.fit_on_texts(all_texts)
+        The tokenizer is the same as Tokenizer.fit_on_texts would fit. With
+        cache_dir and a cache_key identifying the texts, the fitted
+        tokenizer is cached, and the texts are not read when it is reused.
+        """
+        # Reuse the tokenizer fitted on the same corpus with the same settings
+        cache_path = None
+        if self.cache_dir and cache_key:
+            cache_path = self._cache_path('tokenizer', cache_key, '.json')
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r') as f:
+                    self.tokenizer = tokenizer_from_json(f.read())
+                return self._build_vocabulary()
         
-        # Create word-to-index and index-to-word mappings
-        self.word_to_index = self.tokenizer.word_index
-        self.index_to_word = {v: k for k, v in self.word_to_index.items()}
+        # Chunks are merged in order, so words keep their order of first occurrence
+        tokenizer = self.tokenizer
+        chunk_results = self._map_chunks(count_chunk, self._chunks(texts), tokenizer_state(tokenizer))
+        for word_counts, word_docs, document_count in chunk_results:
+            for word, count in word_counts.items():
+                tokenizer.word_counts[word] = tokenizer.word_counts.get(word, 0) + count
+            for word, count in word_docs.items():
+                tokenizer.word_docs[word] += count
+            tokenizer.document_count += document_count
+        self._index_words()
+        
+        if cache_path:
+            self._write_atomic(cache_path, lambda f: f.write(self.tokenizer.to_json().encode('utf-8')))
+        
+        return self._build_vocabulary()
+    
+    def _index_words(self):
+        """Number the counted words by frequency, as Tokenizer.fit_on_texts does."""
+        tokenizer = self.tokenizer
+        word_counts = sorted(tokenizer.word_counts.items(), key=lambda item: item[1], reverse=True)
+        # The OOV token always gets index 1
+        sorted_words = [tokenizer.oov_token] if tokenizer.oov_token is not None else []
+        sorted_words.extend(word for word, _ in word_counts)
+        
+        tokenizer.word_index = {word: index for index, word in enumerate(sorted_words, start=1)}
+        tokenizer.index_word = {index: word for word, index in tokenizer.word_index.items()}
+        for word, count in tokenizer.word_docs.items():
+            tokenizer.index_docs[tokenizer.word_index[word]] = count
+    
+    def _build_vocabulary(self):
+        """Create the word/index mappings of the fitted tokenizer.
+        
+        Returns the vocabulary size for the model: one more than the
+        largest index, as index 0 is padding.
+        """
+        # Create word-to-index and index-to-word mappings, without the
+        # words that texts_to_sequences maps to <unk>
+        num_words = self.tokenizer.num_words
+        self.word_to_index = {
+            word: index for word, index in self.tokenizer.word_index.items()
+            if not num_words or index < num_words
+        }
         
         # Add special tokens
         self.word_to_index['<start>'] = len(self.word_to_index) + 1
         self.word_to_index['<end>'] = len(self.word_to_index) + 1
-        self.index_to_word[len(self.word_to_index)] = '<start>'
-        self.index_to_word[len(self.word_to_index)] = '<end>'
+        self.index_to_word = {v: k for k, v in self.word_to_index.items()}
+        
+        self.vocab_size = len(self.word_to_index) + 1
+        return self.vocab_size
+    
+    def texts_to_sequences(self, texts, cache_key=None):
+        """Convert texts to integer sequences, in parallel and cached on disk.
+        
+        texts is a list, or any iterable of texts when cache_key identifies
+        it. Returns a SequenceStore. With cache_dir, the sequences are
+        written to one .npy file as they are converted (with their offsets
+        in a second one), keyed by a hash of the texts and of the fitted
+        tokenizer, and the store reads the file memory-mapped.
+        """
+        # Nothing is converted until the results are read
+        chunk_results = self._map_chunks(tokenize_chunk, self._chunks(texts), tokenizer_state(self.tokenizer))
+        if not self.cache_dir:
+            chunk_data, chunk_lengths = [], []
+            for data, lengths in chunk_results:
+                chunk_data.append(data)
+                chunk_lengths.append(lengths)
+            return SequenceStore(
+                np.concatenate(chunk_data) if chunk_data else np.zeros(0, dtype=np.int32),
+                self._offsets(chunk_lengths)
+            )
         
-        return len(self.word_to_index)
+        cache_key = cache_key or hash_texts(texts)
+        data_path = self._cache_path('sequences', cache_key, '.npy')
+        offsets_path = self._cache_path('sequences', cache_key, '.offsets.npy')
+        
+        if not (os.path.exists(data_path) and os.path.exists(offsets_path)):
+            # Stream the chunks to a raw file, then store it as .npy once its length is known
+            os.makedirs(self.cache_dir, exist_ok=True)
+            raw_path = f"{data_path}.{os.getpid()}.raw"
+            chunk_lengths = []
+            try:
+                with open(raw_path, 'wb') as f:
+                    for data, lengths in chunk_results:
+                        data.tofile(f)
+                        chunk_lengths.append(lengths)
+                offsets = self._offsets(chunk_lengths)
+                data = np.memmap(raw_path, dtype=np.int32, mode='r') if offsets[-1] else np.zeros(0, dtype=np.int32)
+                # The data file is written first, so the offsets file marks a complete entry
+                self._write_atomic(data_path, lambda f: np.save(f, data))
+                self._write_atomic(offsets_path, lambda f: np.save(f, offsets))
+                del data
+            finally:
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+        
+        return SequenceStore(np.load(data_path, mmap_mode='r'), np.load(offsets_path))
+    
+    def _offsets(self, chunk_lengths):
+        """Offsets of the sequences in the flat array, from the lengths of each chunk."""
+        lengths = np.concatenate(chunk_lengths) if chunk_lengths else np.zeros(0, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return offsets
+    
+    def _write_atomic(self, path, write):
+        """Write a cache file under a temporary name, then move it into place."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
     
     def prepare_sequences(self, texts, summaries):
         """Prepare input and target sequences for training."""
-        # Convert texts to sequences
-        text_sequences = self.tokenizer.texts_to_sequences(texts)
+        # Convert texts and summaries to sequences in one pass
+        sequences = self.texts_to_sequences(texts + summaries)
+        text_sequences = [sequences[i] for i in range(len(texts))]
         
-        # Convert summaries to sequences and add start/end tokens
-        summary_sequences = []
-        for summary in summaries:
-            seq = self.tokenizer.texts_to_sequences([summary])[0]
-            seq = [self.word_to_index['<start>']] + seq + [self.word_to_index['<end>']]
-            summary_sequences.append(seq)
+        # Add start/end tokens to the summaries
+        start = np.array([self.word_to_index['<start>']], dtype=np.int32)
+        end = np.array([self.word_to_index['<end>']], dtype=np.int32)
+        summary_sequences = [
+            np.concatenate([start, sequences[i], end]) for i in range(len(texts), len(sequences))
+        ]
         
         # Pad sequences
         encoder_input_data = pad_sequences(
@@ -77,6 +329,23 @@ class DataProcessor:
         
         return encoder_input_data, decoder_input_data, decoder_target_data
     
+    def encode_sequences(self, text_sequence, summary_sequence):
+        """Convert one article/summary pair of integer sequences to unpadded input and target sequences.
+        
+        The sequences are truncated like prepare_sequences truncates them,
+        so batches padded from them hold the same data.
+        """
+        text_sequence = np.array(text_sequence[-self.max_text_len:], dtype=np.int32)
+        
+        decoder_input = np.concatenate([
+            [self.word_to_index['<start>']], summary_sequence, [self.word_to_index['<end>']]
+        ]).astype(np.int32)[-self.max_summary_len:]
+        
+        # Decoder target is the decoder input shifted by one
+        decoder_target = np.append(decoder_input[1:], 0).astype(np.int32)
+        
+        return text_sequence, decoder_input, decoder_target
+    
     def prepare_inference_input(self, text):
         """Prepare input sequence for inference."""
         # Preprocess text
@@ -111,5 +380,5 @@ class DataProcessor:
         return len(sent_tokenize(text))
     
     def get_vocabulary_size(self):
-        """Get size of vocabulary."""
-        return len(self.word_to_index) 
\ No newline at end of file
+        """Get size of vocabulary, including the padding index."""
+        return self.vocab_size 
\ No newline at end of file
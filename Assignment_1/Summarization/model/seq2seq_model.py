@@ -12,6 +12,8 @@ class Seq2SeqSummarizer:
         self.encoder = None
         self.decoder = None
         self.model = None
+        self.hidden_model = None
+        self.decoder_dense = None
         
     def build_model(self):
         # Encoder
@@ -27,10 +29,14 @@ class Seq2SeqSummarizer:
         decoder_lstm = LSTM(self.latent_dim, return_sequences=True, return_state=True)
         decoder_outputs, _, _ = decoder_lstm(decoder_embedding, initial_state=encoder_states)
         decoder_dense = Dense(self.vocab_size, activation='softmax')
+        decoder_hidden = decoder_outputs
         decoder_outputs = decoder_dense(decoder_outputs)
         
         # Model
         self.model = Model([encoder_inputs, decoder_inputs], decoder_outputs)
+        # The same model without the output layer, for sampled softmax training
+        self.hidden_model = Model([encoder_inputs, decoder_inputs], decoder_hidden)
+        self.decoder_dense = decoder_dense
         self.model.compile(
             optimizer=Adam(learning_rate=0.001),
             loss='sparse_categorical_crossentropy',
@@ -56,6 +62,43 @@ class Seq2SeqSummarizer:
             [decoder_outputs] + decoder_states
         )
         
+        self._build_step_functions()
+        
+    def _build_step_functions(self):
+        """Compile the encoder and single-step decoder functions used for inference.
+        
+        Model.predict sets up a data adapter and callbacks on every call,
+        which costs far more than one LSTM step. These functions call the
+        models directly, are traced once for any batch size, and take and
+        return the states as tensors so they stay on the device between steps.
+        """
+        step_signature = [
+            tf.TensorSpec(shape=(None,), dtype=tf.int32),
+            tf.TensorSpec(shape=(None, self.latent_dim), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, self.latent_dim), dtype=tf.float32),
+            tf.TensorSpec(shape=(self.vocab_size,), dtype=tf.float32),
+        ]
+        encoder = self.encoder
+        decoder = self.decoder
+        
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, None), dtype=tf.int32)])
+        def encode(input_seqs):
+            return encoder(input_seqs, training=False)
+        
+        @tf.function(input_signature=step_signature)
+        def decode_step(tokens, h, c, token_bias):
+            output_tokens, h, c = decoder([tokens[:, tf.newaxis], h, c], training=False)
+            return tf.math.log(tf.maximum(output_tokens[:, -1, :], 1e-12)) + token_bias, h, c
+        
+        @tf.function(input_signature=step_signature)
+        def greedy_step(tokens, h, c, token_bias):
+            output_tokens, h, c = decoder([tokens[:, tf.newaxis], h, c], training=False)
+            return tf.argmax(output_tokens[:, -1, :] + token_bias, axis=-1, output_type=tf.int32), h, c
+        
+        self._encode_fn = encode
+        self._decode_step_fn = decode_step
+        self._greedy_step_fn = greedy_step
+        
     def train(self, encoder_input_data, decoder_input_data, decoder_target_data,
               batch_size=64, epochs=10, validation_split=0.2):
         """Train the model."""
@@ -67,39 +110,231 @@ class Seq2SeqSummarizer:
             validation_split=validation_split
         )
     
+    def train_sampled(self, encoder_input_data, decoder_input_data, decoder_target_data,
+                      batch_size=64, epochs=10, validation_split=0.2, num_sampled=512):
+        """Train the model on arrays with a sampled softmax loss.
+        
+        Like train, the last validation_split of the examples is held out
+        for validation and the training examples are shuffled every epoch.
+        """
+        num_validation = int(len(encoder_input_data) * validation_split)
+        num_train = len(encoder_input_data) - num_validation
+        
+        def make_dataset(start, stop):
+            return tf.data.Dataset.from_tensor_slices((
+                (encoder_input_data[start:stop].astype(np.int32), decoder_input_data[start:stop].astype(np.int32)),
+                decoder_target_data[start:stop].astype(np.int32)
+            ))
+        
+        train_dataset = make_dataset(0, num_train).shuffle(num_train).batch(batch_size)
+        validation_data = make_dataset(num_train, None).batch(batch_size) if num_validation else None
+        return self.train_sampled_on_dataset(
+            train_dataset, epochs=epochs, validation_data=validation_data, num_sampled=num_sampled
+        )
+    
+    def train_on_dataset(self, dataset, epochs=10, validation_data=None):
+        """Train the model on a tf.data dataset of ((encoder_input, decoder_input), decoder_target) batches."""
+        return self.model.fit(
+            dataset,
+            epochs=epochs,
+            validation_data=validation_data
+        )
+    
+    def train_sampled_on_dataset(self, dataset, epochs=10, validation_data=None, num_sampled=512):
+        """Train the model on a tf.data dataset with a sampled softmax loss.
+        
+        Each step computes the output layer for the target word and
+        num_sampled sampled words only, instead of for the whole
+        vocabulary. Padding positions are left out of the loss. The same
+        output layer is used with the full softmax for validation and
+        inference, so the trained model is used like any other.
+        """
+        train_step = self._build_sampled_train_step(num_sampled)
+        history = tf.keras.callbacks.History()
+        history.history = {'loss': []}
+        
+        for epoch in range(epochs):
+            total_loss = 0.0
+            steps = 0
+            for inputs, targets in dataset:
+                total_loss += float(train_step(inputs, targets))
+                steps += 1
+            history.history['loss'].append(total_loss / max(steps, 1))
+            message = f"Epoch {epoch + 1}/{epochs} - loss: {history.history['loss'][-1]:.4f}"
+            
+            # Validate with the full softmax
+            if validation_data is not None:
+                metrics = self.model.evaluate(validation_data, return_dict=True, verbose=0)
+                for name, value in metrics.items():
+                    history.history.setdefault(f"val_{name}", []).append(value)
+                    message += f" - val_{name}: {value:.4f}"
+            print(message)
+        
+        return history
+    
+    def _build_sampled_train_step(self, num_sampled):
+        """Compile one training step with a sampled softmax loss."""
+        if self.hidden_model is None or self.decoder_dense is None:
+            raise ValueError("Sampled softmax training needs the model to be built with build_model() first.")
+        hidden_model = self.hidden_model
+        dense = self.decoder_dense
+        optimizer = self.model.optimizer
+        variables = self.model.trainable_variables
+        latent_dim = self.latent_dim
+        vocab_size = self.vocab_size
+        
+        sequence_spec = tf.TensorSpec(shape=(None, None), dtype=tf.int32)
+        
+        @tf.function(input_signature=[(sequence_spec, sequence_spec), sequence_spec])
+        def train_step(inputs, targets):
+            labels = tf.reshape(tf.cast(targets, tf.int64), [-1, 1])
+            mask = tf.cast(tf.reshape(targets, [-1]) != 0, tf.float32)
+            with tf.GradientTape() as tape:
+                hidden = tf.reshape(hidden_model(inputs, training=True), [-1, latent_dim])
+                losses = tf.nn.sampled_softmax_loss(
+                    weights=tf.transpose(dense.kernel),
+                    biases=dense.bias,
+                    labels=labels,
+                    inputs=hidden,
+                    num_sampled=num_sampled,
+                    num_classes=vocab_size
+                )
+                loss = tf.reduce_sum(losses * mask) / tf.maximum(tf.reduce_sum(mask), 1.0)
+            gradients = tape.gradient(loss, variables)
+            optimizer.apply_gradients(zip(gradients, variables))
+            return loss
+        
+        return train_step
+    
     def predict(self, input_seq, max_summary_length, word_to_index, index_to_word):
         """Generate summary for input sequence."""
-        # Encode the input sequence
-        states_value = self.encoder.predict(input_seq)
+        return self.predict_batch(input_seq, max_summary_length, word_to_index, index_to_word)[0]
+    
+    def predict_batch(self, input_seqs, max_summary_length, word_to_index, index_to_word,
+                      beam_width=1, length_penalty=1.0, allow_unk=False):
+        """Generate summaries for a batch of input sequences.
         
-        # Generate empty target sequence
-        target_seq = np.zeros((1, 1))
-        target_seq[0, 0] = word_to_index['<start>']
+        All articles are encoded in one call and decoded together, one
+        decoder call per output position for the whole batch. With
+        beam_width > 1 a beam search is run instead of greedy decoding.
+        Padding, <start> and (unless allow_unk) <unk> are never generated.
+        """
+        input_seqs = np.asarray(input_seqs)
+        if input_seqs.ndim == 1:
+            input_seqs = input_seqs[np.newaxis, :]
         
-        # Initialize summary
-        summary = []
+        # Encode all input sequences at once
+        h, c = self._encode_fn(tf.convert_to_tensor(input_seqs, dtype=tf.int32))
+        
+        start_index = word_to_index['<start>']
+        end_index = word_to_index['<end>']
+        
+        # Added to the decoder output, to rule out tokens that should not be generated
+        blocked = [0, start_index]
+        if not allow_unk and '<unk>' in word_to_index:
+            blocked.append(word_to_index['<unk>'])
+        token_bias = np.zeros(self.vocab_size, dtype=np.float32)
+        token_bias[blocked] = -np.inf
+        token_bias = tf.constant(token_bias)
         
-        # Generate summary
-        for _ in range(max_summary_length):
-            output_tokens, h, c = self.decoder.predict(
-                [target_seq] + states_value
+        if beam_width > 1:
+            sequences = self._beam_search(
+                h, c, token_bias, max_summary_length, start_index, end_index, beam_width, length_penalty
             )
+        else:
+            sequences = self._greedy_search(h, c, token_bias, max_summary_length, start_index, end_index)
+        
+        return [self._sequence_to_text(seq, end_index, index_to_word) for seq in sequences]
+    
+    def _decode_step(self, tokens, h, c, token_bias):
+        """Run one decoder step for a batch of tokens, returning log-probabilities and states."""
+        log_probs, h, c = self._decode_step_fn(tf.convert_to_tensor(tokens, dtype=tf.int32), h, c, token_bias)
+        return log_probs.numpy(), h, c
+    
+    def _greedy_search(self, h, c, token_bias, max_summary_length, start_index, end_index):
+        """Greedy decoding of a batch, keeping a finished mask per sequence."""
+        batch_size = h.shape[0]
+        sequences = np.zeros((batch_size, max_summary_length), dtype=np.int32)
+        tokens = tf.fill([batch_size], tf.constant(start_index, dtype=tf.int32))
+        # Rows of the sequences still being decoded; h, c and tokens only hold these rows
+        active = np.arange(batch_size)
+        
+        for step in range(max_summary_length):
+            tokens, h, c = self._greedy_step_fn(tokens, h, c, token_bias)
+            sampled = tokens.numpy()
+            sequences[active, step] = sampled
             
-            # Sample a token
-            sampled_token_index = np.argmax(output_tokens[0, -1, :])
-            sampled_word = index_to_word[sampled_token_index]
-            
-            # Exit if end token is predicted
-            if sampled_word == '<end>':
+            # Drop the sequences that produced <end> from the next steps
+            unfinished = sampled != end_index
+            if not unfinished.all():
+                active = active[unfinished]
+                if active.size == 0:
+                    break
+                keep = tf.constant(np.flatnonzero(unfinished), dtype=tf.int32)
+                tokens, h, c = tf.gather(tokens, keep), tf.gather(h, keep), tf.gather(c, keep)
+        
+        return sequences
+    
+    def _beam_search(self, h, c, token_bias, max_summary_length, start_index, end_index, beam_width, length_penalty):
+        """Beam search over a batch, with the beams of all sequences decoded together."""
+        batch_size = h.shape[0]
+        rows = batch_size * beam_width
+        
+        # Flatten (batch, beam) into one decoder batch
+        h = tf.repeat(h, beam_width, axis=0)
+        c = tf.repeat(c, beam_width, axis=0)
+        tokens = np.full(rows, start_index, dtype=np.int32)
+        sequences = np.zeros((rows, max_summary_length), dtype=np.int32)
+        lengths = np.zeros(rows, dtype=np.int32)
+        finished = np.zeros(rows, dtype=bool)
+        
+        # All beams start identical, so only the first one is expanded at the first step
+        scores = np.full((batch_size, beam_width), -np.inf, dtype=np.float32)
+        scores[:, 0] = 0.0
+        scores = scores.reshape(rows)
+        
+        for step in range(max_summary_length):
+            if finished.all():
                 break
-                
-            summary.append(sampled_word)
+            log_probs, h, c = self._decode_step(tokens, h, c, token_bias)
+            vocab_size = log_probs.shape[-1]
+            
+            # A finished beam keeps its score and can only be extended by one padding token
+            log_probs[finished] = -np.inf
+            log_probs[finished, 0] = 0.0
+            
+            candidates = (scores[:, np.newaxis] + log_probs).reshape(batch_size, beam_width * vocab_size)
+            best = np.argpartition(-candidates, beam_width - 1, axis=-1)[:, :beam_width]
             
-            # Update target sequence and states
-            target_seq = np.zeros((1, 1))
-            target_seq[0, 0] = sampled_token_index
-            states_value = [h, c]
+            # Map the chosen candidates back to their source beam and token
+            source = (best // vocab_size + np.arange(batch_size)[:, np.newaxis] * beam_width).reshape(rows)
+            new_tokens = (best % vocab_size).reshape(rows).astype(np.int32)
+            scores = np.take_along_axis(candidates, best, axis=-1).reshape(rows)
+            
+            h, c = tf.gather(h, source), tf.gather(c, source)
+            sequences = sequences[source]
+            lengths = lengths[source]
+            was_finished = finished[source]
+            
+            sequences[:, step] = np.where(was_finished, 0, new_tokens)
+            lengths = lengths + ~was_finished
+            finished = was_finished | (new_tokens == end_index)
+            tokens = new_tokens
         
+        # Pick the best beam of every sequence, normalised by length
+        normalised = scores / np.maximum(lengths, 1) ** length_penalty
+        best_beam = np.argmax(normalised.reshape(batch_size, beam_width), axis=-1)
+        return sequences.reshape(batch_size, beam_width, -1)[np.arange(batch_size), best_beam]
+    
+    def _sequence_to_text(self, sequence, end_index, index_to_word):
+        """Convert decoded token indices to text, stopping at <end>."""
+        summary = []
+        for index in sequence:
+            if index == end_index:
+                break
+            word = index_to_word.get(int(index))
+            if word:
+                summary.append(word)
         return ' '.join(summary)
     
     def save_model(self, filepath):
@@ -0,0 +1,98 @@
+"""Word counting and tokenisation run in DataProcessor's worker processes.
+
+The code here does not need TensorFlow. Worker processes are spawned,
+though, and a spawned process also imports the main module again, so a
+worker started from train.py still imports TensorFlow once when it starts.
+The counting reproduces the Keras Tokenizer's fit_on_texts, and the
+tokenisation its texts_to_sequences, from the tokenizer's settings and word
+index.
+"""
+import pickle
+
+import numpy as np
+
+# Tokenizer settings of the current worker process, set by init_tokenizer
+_tokenizer_state = None
+# File the settings were read from, so run_chunk reads each file once
+_state_path = None
+
+
+def tokenizer_state(tokenizer):
+    """Extract what count_chunk and tokenize_chunk need from a Keras Tokenizer."""
+    return {
+        'word_index': tokenizer.word_index,
+        'num_words': tokenizer.num_words,
+        'oov_index': tokenizer.word_index.get(tokenizer.oov_token) if tokenizer.oov_token else None,
+        'filters': tokenizer.filters,
+        'lower': tokenizer.lower,
+        'split': tokenizer.split,
+    }
+
+
+def init_tokenizer(state):
+    global _tokenizer_state
+    _tokenizer_state = state
+
+
+def run_chunk(task):
+    """Run function(chunk) for a (function, state_path, chunk) task in a worker."""
+    global _state_path
+    function, state_path, chunk = task
+    if state_path != _state_path:
+        with open(state_path, 'rb') as f:
+            init_tokenizer(pickle.load(f))
+        _state_path = state_path
+    return function(chunk)
+
+
+def _words(text, state, translate_map):
+    """Split a text into words, like text_to_word_sequence."""
+    if state['lower']:
+        text = text.lower()
+    return [word for word in text.translate(translate_map).split(state['split']) if word]
+
+
+def count_chunk(texts):
+    """Count words like Tokenizer.fit_on_texts.
+
+    Returns the word counts (in order of first occurrence), the number of
+    texts each word occurs in, and the number of texts.
+    """
+    state = _tokenizer_state
+    translate_map = str.maketrans({c: state['split'] for c in state['filters']})
+
+    word_counts = {}
+    word_docs = {}
+    for text in texts:
+        words = _words(text, state, translate_map)
+        for word in words:
+            word_counts[word] = word_counts.get(word, 0) + 1
+        for word in set(words):
+            word_docs[word] = word_docs.get(word, 0) + 1
+    return word_counts, word_docs, len(texts)
+
+
+def tokenize_chunk(texts):
+    """Convert texts to integer sequences, like Tokenizer.texts_to_sequences.
+
+    Returns the sequences concatenated into one int32 array, and the length
+    of each sequence, so a chunk is sent back as two arrays.
+    """
+    state = _tokenizer_state
+    word_index = state['word_index']
+    num_words = state['num_words']
+    oov_index = state['oov_index']
+    translate_map = str.maketrans({c: state['split'] for c in state['filters']})
+
+    data = []
+    lengths = np.zeros(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        start = len(data)
+        for word in _words(text, state, translate_map):
+            index = word_index.get(word)
+            if index is not None and not (num_words and index >= num_words):
+                data.append(index)
+            elif oov_index is not None:
+                data.append(oov_index)
+        lengths[i] = len(data) - start
+    return np.array(data, dtype=np.int32), lengths
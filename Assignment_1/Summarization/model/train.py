@@ -3,6 +3,7 @@ import json
 import numpy as np
 from seq2seq_model import Seq2SeqSummarizer
 from data_processor import DataProcessor
+from data_pipeline import hash_files, iter_examples, iter_texts, list_data_files, make_dataset, tokenize_files
 import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 
@@ -11,13 +12,10 @@ def load_data(data_dir):
     texts = []
     summaries = []
     
-    # Load data from JSON files
-    for filename in os.listdir(data_dir):
-        if filename.endswith('.json'):
-            with open(os.path.join(data_dir, filename), 'r') as f:
-                data = json.load(f)
-                texts.append(data['text'])
-                summaries.append(data['summary'])
+    # Load data from JSON and JSON Lines files
+    for text, summary in iter_examples(list_data_files(data_dir)):
+        texts.append(text)
+        summaries.append(summary)
     
     return texts, summaries
 
@@ -34,9 +32,10 @@ def plot_training_history(history):
     plt.ylabel('Loss')
     plt.legend()
     
-    # Plot accuracy
+    # Plot accuracy (sampled softmax training only measures it on validation data)
     plt.subplot(1, 2, 2)
-    plt.plot(history.history['accuracy'], label='Training Accuracy')
+    if 'accuracy' in history.history:
+        plt.plot(history.history['accuracy'], label='Training Accuracy')
     plt.plot(history.history['val_accuracy'], label='Validation Accuracy')
     plt.title('Model Accuracy')
     plt.xlabel('Epoch')
@@ -47,20 +46,47 @@ def plot_training_history(history):
     plt.savefig('training_history.png')
     plt.close()
 
-def main():
-    # Parameters
-    data_dir = '../data'
-    model_dir = '../model/weights'
-    max_text_len = 400
-    max_summary_len = 100
-    embedding_dim = 256
-    latent_dim = 512
-    batch_size = 32
-    epochs = 10
+def train_streaming(data_dir, max_text_len, max_summary_len, embedding_dim, latent_dim,
+                    batch_size, epochs, validation_split, max_vocab_size=None, num_sampled=None, cache_dir=None):
+    """Train on batches streamed from the tokenised data files."""
+    data_files = list_data_files(data_dir)
+    files_hash = hash_files(data_files) if cache_dir else None
+    
+    # Fit the tokenizer in one parallel pass over the training split
+    print("Building vocabulary...")
+    processor = DataProcessor(max_text_len, max_summary_len, max_vocab_size, cache_dir=cache_dir)
+    vocab_size = processor.fit_tokenizer_on_stream(
+        iter_texts(data_files, split='train', validation_split=validation_split),
+        cache_key=files_hash and f"{files_hash}:train:{validation_split}"
+    )
     
-    # Create model directory if it doesn't exist
-    os.makedirs(model_dir, exist_ok=True)
+    # Tokenise each split once; every epoch streams slices of the sequences
+    print("Tokenising data...")
+    train_sequences = tokenize_files(processor, data_files, 'train', validation_split, files_hash)
+    val_sequences = tokenize_files(processor, data_files, 'validation', validation_split, files_hash)
+    train_dataset = make_dataset(processor, train_sequences, batch_size)
+    val_dataset = make_dataset(processor, val_sequences, batch_size, shuffle_buffer=0)
+    processor.close()
     
+    # Initialize and build model
+    print("Building model...")
+    model = Seq2SeqSummarizer(vocab_size, embedding_dim, latent_dim)
+    model.build_model()
+    
+    # Train model
+    print("Training model...")
+    if num_sampled:
+        history = model.train_sampled_on_dataset(
+            train_dataset, epochs=epochs, validation_data=val_dataset, num_sampled=num_sampled
+        )
+    else:
+        history = model.train_on_dataset(train_dataset, epochs=epochs, validation_data=val_dataset)
+    
+    return processor, model, history
+
+def train_in_memory(data_dir, max_text_len, max_summary_len, embedding_dim, latent_dim,
+                    batch_size, epochs, validation_split, max_vocab_size=None, num_sampled=None, cache_dir=None):
+    """Train on the whole corpus padded into arrays."""
     # Load and preprocess data
     print("Loading data...")
     texts, summaries = load_data(data_dir)
@@ -72,7 +98,7 @@ def main():
     
     # Initialize data processor
     print("Preprocessing data...")
-    processor = DataProcessor(max_text_len, max_summary_len)
+    processor = DataProcessor(max_text_len, max_summary_len, max_vocab_size, cache_dir=cache_dir)
     vocab_size = processor.fit_tokenizer(train_texts, train_summaries)
     
     # Prepare sequences
@@ -82,6 +108,7 @@ def main():
     val_encoder_input, val_decoder_input, val_decoder_target = processor.prepare_sequences(
         val_texts, val_summaries
     )
+    processor.close()
     
     # Initialize and build model
     print("Building model...")
@@ -90,14 +117,63 @@ def main():
     
     # Train model
     print("Training model...")
-    history = model.train(
-        train_encoder_input,
-        train_decoder_input,
-        train_decoder_target,
-        batch_size=batch_size,
-        epochs=epochs,
-        validation_split=0.2
-    )
+    if num_sampled:
+        history = model.train_sampled(
+            train_encoder_input,
+            train_decoder_input,
+            train_decoder_target,
+            batch_size=batch_size,
+            epochs=epochs,
+            validation_split=validation_split,
+            num_sampled=num_sampled
+        )
+    else:
+        history = model.train(
+            train_encoder_input,
+            train_decoder_input,
+            train_decoder_target,
+            batch_size=batch_size,
+            epochs=epochs,
+            validation_split=validation_split
+        )
+    
+    return processor, model, history
+
+def main():
+    # Parameters
+    data_dir = '../data'
+    model_dir = '../model/weights'
+    max_text_len = 400
+    max_summary_len = 100
+    embedding_dim = 256
+    latent_dim = 512
+    batch_size = 32
+    epochs = 10
+    # Stream batches from the data files instead of loading the whole corpus
+    # (uses a hash-based train/validation split, so results differ from the
+    # in-memory path's train_test_split)
+    stream_data = False
+    validation_split = 0.2
+    # Keep only the most frequent words (the others become <unk>), e.g. 20000
+    max_vocab_size = None
+    # Train with a sampled softmax over this many words per step, e.g. 512
+    num_sampled = None
+    # Tokenizer and integer sequences are cached here
+    cache_dir = '../data/cache'
+    
+    # Create model directory if it doesn't exist
+    os.makedirs(model_dir, exist_ok=True)
+    
+    if stream_data:
+        processor, model, history = train_streaming(
+            data_dir, max_text_len, max_summary_len, embedding_dim, latent_dim,
+            batch_size, epochs, validation_split, max_vocab_size, num_sampled, cache_dir
+        )
+    else:
+        processor, model, history = train_in_memory(
+            data_dir, max_text_len, max_summary_len, embedding_dim, latent_dim,
+            batch_size, epochs, validation_split, max_vocab_size, num_sampled, cache_dir
+        )
     
     # Plot training history
     plot_training_history(history)
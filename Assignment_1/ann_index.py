@@ -0,0 +1,179 @@
+'''
+Optional approximate nearest-neighbour (ANN) backend for Glove, built on faiss.
+
+Indexes are built over the L2-normalised embedding matrix with the inner
+product metric, so their scores are cosine similarities like the exact
+search. Two index types are supported:
+
+    ivf_flat  inverted file over k-means cells, searches `nprobe` cells
+    hnsw      hierarchical navigable small-world graph, searches `ef_search` nodes
+
+Build and persist an index once, then load it at startup:
+
+    python ann_index.py build glove.6B.300d.npy --type hnsw
+    python ann_index.py recall glove.6B.300d.npy --type hnsw --k 10
+'''
+import argparse
+import os
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+try:
+    import faiss
+except ImportError: # faiss-cpu is optional, exact search works without it
+    faiss = None
+
+INDEX_TYPES = ("ivf_flat", "hnsw")
+
+
+def ann_index_path(prefix:str, index_type:str) -> str:
+    '''
+    Default location of an index next to a GloVe store, e.g.
+    glove.6B.300d.hnsw.faiss
+    '''
+    return f"{prefix}.{index_type}.faiss"
+
+
+def _require_faiss():
+    if faiss is None:
+        raise ImportError("The ANN backend needs faiss. Install it with `pip install faiss-cpu`.")
+
+
+class AnnIndex:
+    def __init__(self, index, index_type:str, nprobe:int = 16, ef_search:int = 128):
+        '''
+        Wraps a faiss index. nprobe (ivf_flat) and ef_search (hnsw) trade
+        recall for speed and are fixed for the lifetime of the index, since
+        faiss stores them on the shared index object.
+        '''
+        self.index = index
+        self.index_type = index_type
+        if index_type == "ivf_flat":
+            self.index.nprobe = nprobe
+        elif index_type == "hnsw":
+            self.index.hnsw.efSearch = ef_search
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    @classmethod
+    def build(cls, unit_vectors:ndarray, index_type:str = "hnsw", nlist:int | None = None,
+              hnsw_m:int = 32, ef_construction:int = 200, train_size:int = 100000,
+              nprobe:int = 16, ef_search:int = 128, seed:int = 0) -> "AnnIndex":
+        '''
+        Builds an index over L2-normalised vectors. For ivf_flat, nlist
+        defaults to 4 * sqrt(V) cells trained on a random sample of at most
+        train_size rows.
+        '''
+        _require_faiss()
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown ANN index type '{index_type}', expected one of {INDEX_TYPES}")
+        vectors = np.ascontiguousarray(unit_vectors, dtype=np.float32)
+        num_vectors, dim = vectors.shape
+
+        if index_type == "ivf_flat":
+            nlist = nlist or max(1, int(4 * np.sqrt(num_vectors)))
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(num_vectors, min(num_vectors, max(train_size, nlist * 39)), replace=False)
+            index.train(vectors[np.sort(sample)])
+        else:
+            index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = ef_construction
+        index.add(vectors)
+        return cls(index, index_type, nprobe=nprobe, ef_search=ef_search)
+
+    def save(self, path:str):
+        _require_faiss()
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path:str, nprobe:int = 16, ef_search:int = 128) -> "AnnIndex":
+        '''
+        Reads an index written by save(). The index type is detected from
+        the stored faiss index.
+        '''
+        _require_faiss()
+        index = faiss.read_index(path)
+        if hasattr(index, "hnsw"):
+            index_type = "hnsw"
+        elif hasattr(index, "nprobe"):
+            index_type = "ivf_flat"
+        else:
+            raise ValueError(f"{path} is not an ivf_flat or hnsw index")
+        return cls(index, index_type, nprobe=nprobe, ef_search=ef_search)
+
+    def search(self, queries:ndarray, k:int) -> Tuple[ndarray, ndarray]:
+        '''
+        Returns (scores, ids) of shape (len(queries), k). Missing results
+        have id -1.
+        '''
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        return self.index.search(queries, k)
+
+
+def recall_at_k(glove, backend:str, k:int = 10, sample_size:int = 1000, seed:int = 0) -> Dict[str, float]:
+    '''
+    Compares an ANN backend of a Glove model with exact search on a random
+    sample of vocabulary words. Returns recall@k (the share of the exact
+    top-k found by the index) and the mean per-query latency of both.
+    '''
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(glove), min(sample_size, len(glove)), replace=False)
+    words = [glove.words[i] for i in sample]
+
+    start = time.perf_counter()
+    exact = glove.get_nearest_neighbors_batch(words, k)
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate = glove.get_nearest_neighbors_batch(words, k, backend=backend)
+    ann_seconds = time.perf_counter() - start
+
+    hits = 0
+    total = 0
+    for exact_neighbors, ann_neighbors in zip(exact, approximate):
+        expected = {word for word, _ in exact_neighbors}
+        hits += len(expected.intersection(word for word, _ in ann_neighbors))
+        total += len(expected)
+    return {
+        "recall_at_k": hits / total if total else 0.0,
+        "exact_ms_per_query": 1000 * exact_seconds / len(words),
+        "ann_ms_per_query": 1000 * ann_seconds / len(words),
+    }
+
+
+def main():
+    from embeddings import Glove
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("build", "recall"))
+    parser.add_argument("glove_path", help="GloVe text file or binary store (.npy)")
+    parser.add_argument("--type", dest="index_type", choices=INDEX_TYPES, default="hnsw")
+    parser.add_argument("--output", default=None, help="Index path (defaults to <glove prefix>.<type>.faiss)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sample-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    glove = Glove(args.glove_path)
+    output = args.output or ann_index_path(os.path.splitext(args.glove_path)[0], args.index_type)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        glove.build_ann_index(args.index_type, path=output)
+        print(f"Built {args.index_type} index over {len(glove)} words in "
+              f"{time.perf_counter() - start:.1f}s and saved it to {output}")
+    else:
+        glove.load_ann_index(output)
+        report = recall_at_k(glove, args.index_type, k=args.k, sample_size=args.sample_size)
+        print(f"recall@{args.k}: {report['recall_at_k']:.4f}")
+        print(f"exact: {report['exact_ms_per_query']:.2f} ms/query, "
+              f"{args.index_type}: {report['ann_ms_per_query']:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+Compares each preprocessing endpoint with the full spaCy pipeline against
+the task-aware pipeline that only runs the components the task needs.
+
+Run from the Assignment_1 directory:
+    python -m benchmarks.bench_components --docs 200 --repeat 3
+'''
+import argparse
+import time
+
+from preprocessing import Preprocessing
+
+SAMPLE_TEXT = (
+    "Apple is looking at buying U.K. startup for $1 billion. "
+    "Dr. Jane Smith from New York visited London on March 10th, 2023, "
+    "for a conference on Artificial Intelligence. The quick brown foxes "
+    "were running over the lazy dogs while the researchers took notes."
+)
+
+# Task used by each endpoint
+ENDPOINT_TASKS = {
+    "/tokenize": ("tokens",),
+    "/lemmatize": ("lemmas",),
+    "/stem": ("stems",),
+    "/pos_tag": ("pos_tags",),
+    "/ner": ("named_entities",),
+}
+
+
+def time_full_pipeline(preprocessor, texts, tasks, repeat):
+    '''
+    Old behaviour: run every component and build the requested output.
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            preprocessor._build_results(preprocessor.nlp(text), tasks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_task_aware(preprocessor, texts, tasks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            preprocessor.analyze(text, tasks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200, help="Number of documents per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    preprocessor = Preprocessing()
+    texts = [SAMPLE_TEXT] * args.docs
+    print(f"Pipeline: {preprocessor.nlp.pipe_names}")
+    print(f"{'endpoint':<12}{'components':<48}{'full (s)':>10}{'task (s)':>10}{'speedup':>9}")
+    for endpoint, tasks in ENDPOINT_TASKS.items():
+        disabled = preprocessor._disabled_components(tasks)
+        enabled = [name for name in preprocessor.nlp.pipe_names if name not in disabled]
+        full = time_full_pipeline(preprocessor, texts, tasks, args.repeat)
+        task_aware = time_task_aware(preprocessor, texts, tasks, args.repeat)
+        print(f"{endpoint:<12}{str(enabled or ['tokenizer']):<48}{full:>10.3f}{task_aware:>10.3f}{full / task_aware:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+'''
+HTTP load test of /process/all and /nearest-neighbors.
+
+By default the API runs in this process: requests go through httpx's ASGI
+transport, with no sockets, and the app uses synthetic embeddings (see
+synthetic.py). With --url, an already running server is tested instead,
+e.g. to size a deployment. Each endpoint is driven by --concurrency
+clients for --duration seconds. The report gives p50/p95/p99 latency and
+throughput.
+
+Run from the Assignment_1 directory:
+    python -m benchmarks.bench_load --concurrency 8 --duration 10 --workers 2
+    python -m benchmarks.bench_load --no-cache --vocab 100000 --dim 300
+    python -m benchmarks.bench_load --url http://localhost:8000 --concurrency 32
+'''
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+from benchmarks.synthetic import synthetic_corpus, synthetic_vocabulary, write_synthetic_glove
+
+
+async def run_endpoint(client:httpx.AsyncClient, make_request, concurrency:int, duration:float):
+    '''
+    Sends requests from `concurrency` clients for `duration` seconds.
+    Returns (latencies of successful requests, status counts, elapsed).
+    '''
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, rng)
+                statuses[response.status_code] += 1
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client_loop(seed) for seed in range(concurrency)])
+    return latencies, statuses, time.perf_counter() - start
+
+
+def print_report(name:str, latencies, statuses, elapsed:float):
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        print(f"{name:<20}{len(latencies) / elapsed:>10.1f}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}   {dict(statuses)}")
+    else:
+        print(f"{name:<20}{'no successful requests':>40}   {dict(statuses)}")
+
+
+async def wait_until_ready(client:httpx.AsyncClient, timeout:float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/health/ready")
+            if response.status_code == 200 and response.json().get("glove_ready"):
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"API not ready after {timeout:.0f}s")
+
+
+async def load_test(client:httpx.AsyncClient, args, texts, words):
+    async def process_all(client, rng):
+        return await client.post("/process/all", json={"text": rng.choice(texts)})
+
+    async def nearest_neighbors(client, rng):
+        return await client.get(f"/nearest-neighbors/{rng.choice(words)}", params={"top_n": args.top_n})
+
+    await wait_until_ready(client, args.ready_timeout)
+    print(f"{args.concurrency} concurrent clients, {args.duration:.0f}s per endpoint")
+    print(f"{'endpoint':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}   statuses")
+    for name, make_request in (("/process/all", process_all), ("/nearest-neighbors", nearest_neighbors)):
+        # A short warm-up so lazy initialisation is not measured
+        await run_endpoint(client, make_request, args.concurrency, min(1.0, args.duration))
+        print_report(name, *await run_endpoint(client, make_request, args.concurrency, args.duration))
+
+
+async def run_in_process(args, texts, words):
+    # main reads its configuration from the environment when it is imported
+    import main
+
+    # Per-request log lines would cost more than some of the requests
+    logging.getLogger().setLevel(logging.WARNING)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await load_test(client, args, texts, words)
+
+
+async def run_against_url(args, texts, words):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        await load_test(client, args, texts, words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test this running server instead of an in-process app")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per endpoint")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic documents to send")
+    parser.add_argument("--words-per-doc", type=int, default=60)
+    parser.add_argument("--vocab", type=int, default=20000, help="Synthetic GloVe vocabulary size")
+    parser.add_argument("--dim", type=int, default=50, help="Synthetic GloVe dimension")
+    parser.add_argument("--query-words", type=int, default=1000, help="Distinct nearest-neighbour query words")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="NLP_WORKER_PROCESSES of the in-process app")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the nearest-neighbour cache")
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = synthetic_corpus(args.docs, args.words_per_doc, args.seed)
+    words = synthetic_vocabulary(args.vocab)[:args.query_words]
+
+    if args.url:
+        asyncio.run(run_against_url(args, texts, words))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["GLOVE_FILE_PATH"] = write_synthetic_glove(
+            os.path.join(tmp, "glove.txt"), args.vocab, args.dim, args.seed
+        )
+        os.environ["NLP_WORKER_PROCESSES"] = str(args.workers)
+        if args.no_cache:
+            os.environ["NEIGHBOR_CACHE_SIZE"] = "0"
+        asyncio.run(run_in_process(args, texts, words))
+
+
+if __name__ == "__main__":
+    main()
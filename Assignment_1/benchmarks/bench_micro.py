@@ -0,0 +1,95 @@
+'''
+Micro-benchmarks of every Preprocessing method and of Glove nearest
+neighbour search, on synthetic data (see synthetic.py), so the numbers
+are comparable from run to run and machine to machine.
+
+Run from the Assignment_1 directory:
+    python -m benchmarks.bench_micro
+    python -m benchmarks.bench_micro --docs 200 --words-per-doc 300 --vocab 100000 --dim 300
+    python -m benchmarks.bench_micro --glove-path glove.6B.300d.npy
+'''
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_corpus, synthetic_vocabulary, write_synthetic_glove
+from embeddings import Glove
+from preprocessing import Preprocessing
+
+
+def measure(fn, inputs, repeat:int):
+    '''
+    Calls fn on every input, repeat times. Returns the per-call seconds of
+    the best run and the median run.
+    '''
+    fn(inputs[0]) # warm-up (lazy initialisation, caches)
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in inputs:
+            fn(value)
+        runs.append((time.perf_counter() - start) / len(inputs))
+    return min(runs), statistics.median(runs)
+
+
+def report(name:str, best:float, median:float, unit:str):
+    print(f"  {name:<38}{best * 1000:>10.3f}{median * 1000:>10.3f}   ms/{unit}   {1 / best:>10.0f} {unit}/s")
+
+
+def bench_preprocessing(texts, repeat:int):
+    preprocessor = Preprocessing()
+    print(f"Preprocessing ({len(texts)} documents, pipeline {preprocessor.nlp.pipe_names})")
+    print(f"  {'':<38}{'best':>10}{'median':>10}")
+    for name in ("tokenize", "lemmatize", "stem", "pos_tagging", "ner", "analyze"):
+        best, median = measure(getattr(preprocessor, name), texts, repeat)
+        report(f"{name}()", best, median, "doc")
+    best, median = measure(lambda batch: preprocessor.analyze_batch(batch), [texts], repeat)
+    report(f"analyze_batch() of {len(texts)}", best / len(texts), median / len(texts), "doc")
+
+
+def bench_glove(glove:Glove, queries:int, top_n:int, repeat:int):
+    words = [glove.words[i % len(glove)] for i in range(queries)]
+    print(f"Glove ({len(glove)} x {glove.embedding_dim}, {queries} queries, top_n={top_n})")
+    print(f"  {'':<38}{'best':>10}{'median':>10}")
+    start = time.perf_counter()
+    glove._get_search_matrix()
+    print(f"  search matrix built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    best, median = measure(glove.get_embedding, words, repeat)
+    report("get_embedding()", best, median, "query")
+    for backend in glove.backends():
+        best, median = measure(lambda word: glove.get_nearest_neighbors(word, top_n, backend=backend), words, repeat)
+        report(f"get_nearest_neighbors({backend})", best, median, "query")
+        best, median = measure(lambda batch: glove.get_nearest_neighbors_batch(batch, top_n, backend=backend), [words], repeat)
+        report(f"get_nearest_neighbors_batch({backend})", best / queries, median / queries, "query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100, help="Synthetic documents")
+    parser.add_argument("--words-per-doc", type=int, default=60)
+    parser.add_argument("--vocab", type=int, default=20000, help="Synthetic GloVe vocabulary size")
+    parser.add_argument("--dim", type=int, default=50, help="Synthetic GloVe dimension")
+    parser.add_argument("--glove-path", help="Use these embeddings instead of synthetic ones")
+    parser.add_argument("--queries", type=int, default=50, help="Nearest-neighbour queries")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-preprocessing", action="store_true")
+    parser.add_argument("--skip-glove", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_preprocessing:
+        bench_preprocessing(synthetic_corpus(args.docs, args.words_per_doc, args.seed), args.repeat)
+    if not args.skip_glove:
+        if args.glove_path:
+            bench_glove(Glove(args.glove_path), args.queries, args.top_n, args.repeat)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = write_synthetic_glove(os.path.join(tmp, "glove.txt"), args.vocab, args.dim, args.seed)
+                bench_glove(Glove(path), args.queries, args.top_n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
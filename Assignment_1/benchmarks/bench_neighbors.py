@@ -0,0 +1,48 @@
+'''
+Times Glove.get_nearest_neighbors against the original pair-by-pair loop
+and checks that both return the same neighbours.
+
+Run from the Assignment_1 directory:
+    python -m benchmarks.bench_neighbors glove.6B.300d.npy --queries 5 --top-n 10
+'''
+import argparse
+import time
+
+import numpy as np
+
+from embeddings import Glove
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("glove_path", help="GloVe text file or binary store (.npy)")
+    parser.add_argument("--queries", type=int, default=5, help="Number of query words")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    glove = Glove(args.glove_path)
+    rng = np.random.default_rng(args.seed)
+    # Sample from the frequent end of the vocabulary, like real traffic
+    words = [glove.words[i] for i in rng.choice(min(len(glove), 10000), args.queries, replace=False)]
+
+    start = time.perf_counter()
+    glove._get_unit_vectors()
+    print(f"Built normalised matrix in {time.perf_counter() - start:.2f}s")
+
+    for word in words:
+        start = time.perf_counter()
+        reference = glove._nearest_neighbors_reference(word, args.top_n)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorised = glove.get_nearest_neighbors(word, args.top_n)
+        vector_time = time.perf_counter() - start
+
+        same = [w for w, _ in reference] == [w for w, _ in vectorised]
+        print(f"{word:<15} loop {loop_time * 1000:9.1f}ms  vectorised {vector_time * 1000:7.2f}ms  "
+              f"same neighbours: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+'''
+Measures how long the API takes to become useful after a (re)start.
+
+Starts `uvicorn main:app` in a subprocess and reports the time until
+    live         /health/live answers
+    ready        /health/ready answers 200 (spaCy loaded)
+    tokenize     the first /tokenize request succeeds
+    glove ready  /health/ready reports GloVe as loaded
+With --glove-path it also times loading Glove from that file in-process,
+e.g. to compare a text file with its binary store.
+
+Run from the Assignment_1 directory:
+    python -m benchmarks.bench_startup --workers 2
+    python -m benchmarks.bench_startup --glove-path glove.6B.300d.txt --glove-path glove.6B.300d.npy
+'''
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+STAGES = ("live", "ready", "tokenize", "glove ready")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(url:str, payload:dict | None = None):
+    '''
+    Returns (status, json body), or (None, None) while the server is not up.
+    '''
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None, None
+
+
+def time_api_startup(workers:int, timeout:float, env_overrides:dict) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, NLP_WORKER_PROCESSES=str(workers), **env_overrides)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    timings = {}
+    try:
+        while len(timings) < len(STAGES) and time.perf_counter() - start < timeout:
+            elapsed = time.perf_counter() - start
+            if "live" not in timings and _request(f"{base}/health/live")[0] == 200:
+                timings["live"] = elapsed
+            if "live" in timings:
+                status, body = _request(f"{base}/health/ready")
+                if status == 200:
+                    timings.setdefault("ready", elapsed)
+                    if body and body.get("glove_ready"):
+                        timings.setdefault("glove ready", elapsed)
+                if "tokenize" not in timings and _request(f"{base}/tokenize", {"text": "Hello world"})[0] == 200:
+                    timings["tokenize"] = elapsed
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def time_glove_load(path:str) -> float:
+    from embeddings import Glove
+
+    start = time.perf_counter()
+    Glove(path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="NLP_WORKER_PROCESSES for the API")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the API")
+    parser.add_argument("--glove-path", action="append", default=[],
+                        help="Also time loading Glove from this file (repeatable)")
+    args = parser.parse_args()
+
+    env_overrides = {}
+    if args.glove_path:
+        env_overrides["GLOVE_FILE_PATH"] = args.glove_path[-1]
+
+    timings = time_api_startup(args.workers, args.timeout, env_overrides)
+    print(f"API startup with {args.workers} worker(s):")
+    for stage in STAGES:
+        value = f"{timings[stage]:.2f}s" if stage in timings else f"not reached in {args.timeout:.0f}s"
+        print(f"  {stage:<12} {value}")
+
+    for path in args.glove_path:
+        print(f"Glove({path!r}) loaded in {time_glove_load(path):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+'''
+Compares plain NLTK Porter stemming with the memoised CachedStemmer on the
+tokens of a repetitive corpus, and reports the cache hit rate.
+
+Run from the Assignment_1 directory:
+    python -m benchmarks.bench_stemming --docs 500 --repeat 3
+    python -m benchmarks.bench_stemming --table glove.6B.300d.stems
+'''
+import argparse
+import time
+
+from nltk.stem import PorterStemmer
+
+from benchmarks.bench_components import SAMPLE_TEXT
+from stemming import CachedStemmer
+
+
+def time_stemming(stem, words, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for word in words:
+            stem(word)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500, help="Number of documents per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--cache-size", type=int, default=100000, help="CachedStemmer maxsize")
+    parser.add_argument("--table", help="Precomputed stem table to load (see stemming.py)")
+    args = parser.parse_args()
+
+    # Whitespace tokens are enough here: only the repetition of words matters
+    words = SAMPLE_TEXT.split() * args.docs
+    plain = time_stemming(PorterStemmer().stem, words, args.repeat)
+    cached_stemmer = CachedStemmer(maxsize=args.cache_size, table_path=args.table)
+    cached = time_stemming(cached_stemmer.stem, words, args.repeat)
+
+    print(f"{len(words)} words, {len(set(words))} distinct")
+    print(f"  PorterStemmer   {plain * 1000:9.1f} ms")
+    print(f"  CachedStemmer   {cached * 1000:9.1f} ms   ({plain / cached:.1f}x)")
+    stats = cached_stemmer.stats()
+    print(f"  hit rate {stats['hit_rate']:.3f} (table hits {stats['table_hits']}, "
+          f"cache hits {stats['hits']}, misses {stats['misses']})")
+
+
+if __name__ == "__main__":
+    main()
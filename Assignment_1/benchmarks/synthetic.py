@@ -0,0 +1,98 @@
+'''
+Reproducible synthetic data for the benchmarks, so they run offline and
+without the real GloVe download.
+
+    synthetic_corpus   English-like documents built from a fixed word list
+    write_synthetic_glove  a small GloVe text file with random vectors
+
+Generate files from the Assignment_1 directory:
+    python -m benchmarks.synthetic --glove bench_glove.txt --words 20000 --dim 50
+    python -m benchmarks.synthetic --corpus corpus.jsonl --docs 1000
+'''
+import argparse
+import json
+import random
+from typing import List
+
+import numpy as np
+
+# Function words repeat the way they do in real text; the rest gives the
+# tagger, lemmatizer, stemmer and NER something to do.
+FUNCTION_WORDS = ("the", "of", "and", "to", "a", "in", "is", "that", "for", "was", "on", "with", "as", "by", "at")
+CONTENT_WORDS = (
+    "running", "runners", "studies", "studied", "companies", "market", "announced", "quickly", "buying",
+    "startup", "billion", "research", "researchers", "conference", "intelligence", "languages", "models",
+    "dogs", "foxes", "lazy", "brown", "walked", "talking", "generously", "happiness", "organization",
+    "government", "policies", "economic", "growth", "reported", "analysts", "expected", "increasing",
+)
+ENTITIES = ("Apple", "Google", "London", "New York", "Jane Smith", "the U.K.", "Microsoft", "Paris", "March 10th")
+
+
+def synthetic_corpus(docs:int, words_per_doc:int = 60, seed:int = 0) -> List[str]:
+    '''
+    Returns docs documents of about words_per_doc words each, the same
+    for the same seed.
+    '''
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(docs):
+        sentences = []
+        words = 0
+        while words < words_per_doc:
+            length = rng.randint(8, 20)
+            sentence = [
+                rng.choice(ENTITIES) if rng.random() < 0.08
+                else rng.choice(FUNCTION_WORDS) if rng.random() < 0.45
+                else rng.choice(CONTENT_WORDS)
+                for _ in range(length)
+            ]
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            words += length
+        corpus.append(" ".join(sentences))
+    return corpus
+
+
+def synthetic_vocabulary(size:int) -> List[str]:
+    '''
+    The corpus words first, so they can be looked up, then made-up words.
+    '''
+    words = list(dict.fromkeys(w.lower() for w in FUNCTION_WORDS + CONTENT_WORDS))
+    words += [f"word{i}" for i in range(max(0, size - len(words)))]
+    return words[:size]
+
+
+def write_synthetic_glove(path:str, words:int = 20000, dim:int = 50, seed:int = 0) -> str:
+    '''
+    Writes a GloVe-format text file of random vectors and returns its path.
+    '''
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for word in synthetic_vocabulary(words):
+            vector = rng.standard_normal(dim).astype(np.float32)
+            f.write(word + " " + " ".join(f"{value:.5f}" for value in vector) + "\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--glove", help="Write a synthetic GloVe text file here")
+    parser.add_argument("--words", type=int, default=20000, help="Vocabulary size of the GloVe file")
+    parser.add_argument("--dim", type=int, default=50, help="Vector dimension of the GloVe file")
+    parser.add_argument("--corpus", help="Write a synthetic NDJSON corpus here (for /process/stream)")
+    parser.add_argument("--docs", type=int, default=1000, help="Documents in the corpus")
+    parser.add_argument("--words-per-doc", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.glove:
+        write_synthetic_glove(args.glove, args.words, args.dim, args.seed)
+        print(f"Wrote {args.words} x {args.dim} vectors to {args.glove}")
+    if args.corpus:
+        with open(args.corpus, "w", encoding="utf-8") as f:
+            for i, text in enumerate(synthetic_corpus(args.docs, args.words_per_doc, args.seed)):
+                f.write(json.dumps({"id": i, "text": text}) + "\n")
+        print(f"Wrote {args.docs} documents to {args.corpus}")
+
+
+if __name__ == "__main__":
+    main()
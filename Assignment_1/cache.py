@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class NeighborCache:
+    def __init__(self, maxsize:int = 10000, ttl_seconds:float | None = None):
+        '''
+        Bounded, thread-safe LRU cache for nearest-neighbour results with an
+        optional time-to-live.
+
+        Requests are keyed by (word, top_n, backend), but only one entry is
+        stored per (word, backend): the result for the largest top_n seen.
+        Its first top_n items answer any request for a smaller top_n.
+        '''
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        # (word, backend) -> (expires_at, top_n, neighbors)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, List[Tuple[str, float]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, word:str, top_n:int, backend:str = "exact") -> Optional[List[Tuple[str, float]]]:
+        '''
+        Returns the cached top_n neighbours, or None on a miss.
+        '''
+        key = (word, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, cached_top_n, neighbors = entry
+                if expires_at < time.monotonic():
+                    del self._entries[key]
+                # From the exact search, a shorter list than asked for means the
+                # vocabulary ran out, so it also answers any larger top_n. An
+                # approximate index can return fewer hits than exist.
+                elif top_n <= cached_top_n or (backend == "exact" and len(neighbors) < cached_top_n):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return neighbors[:top_n]
+            self.misses += 1
+            return None
+
+    def put(self, word:str, top_n:int, backend:str, neighbors:List[Tuple[str, float]]):
+        '''
+        Stores a result unless a longer one is already cached, evicting the
+        least recently used entry when the cache is full.
+        '''
+        if self.maxsize <= 0:
+            return
+        key = (word, backend)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else float("inf")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > top_n and entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (expires_at, top_n, list(neighbors))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
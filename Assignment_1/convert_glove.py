@@ -0,0 +1,29 @@
+'''
+Converts a GloVe text file into the binary store used by Glove.
+
+    python convert_glove.py glove.6B.300d.txt
+    # -> glove.6B.300d.npy + glove.6B.300d.vocab
+
+After the conversion, Glove("glove.6B.300d.txt") and Glove("glove.6B.300d.npy")
+both memory-map the binary store instead of parsing the text file.
+'''
+import argparse
+import time
+
+from embeddings import convert_glove_to_binary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("text_path", help="GloVe text file, e.g. glove.6B.300d.txt")
+    parser.add_argument("output_prefix", nargs="?", default=None,
+                        help="Output path without extension (defaults to the text file name)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matrix_path, vocab_path = convert_glove_to_binary(args.text_path, args.output_prefix)
+    print(f"Wrote {matrix_path} and {vocab_path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
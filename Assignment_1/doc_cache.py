@@ -0,0 +1,173 @@
+'''
+Persistent, content-addressed cache of parsed spaCy Docs.
+
+Parsing is deterministic for a given model and set of pipeline components,
+so Preprocessing can keep the parsed Docs in a local SQLite file, keyed by
+a SHA-256 of (model name and version, enabled components, text) and
+serialised with DocBin. Re-processing an unchanged corpus then only reads
+the file. Several worker processes can share one file.
+
+The file is kept under max_bytes by evicting the least recently used Docs.
+Enable it in the API with DOC_CACHE_PATH (see README).
+'''
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from spacy.tokens import Doc, DocBin
+
+# How often (in writes) the total size is checked against max_bytes
+EVICTION_CHECK_INTERVAL = 100
+# Eviction frees space down to this fraction of max_bytes, so it does not
+# run again on the very next write
+EVICTION_TARGET = 0.9
+
+
+class DocCache:
+    def __init__(self, path:str, max_bytes:int = 1024 * 2**20):
+        '''
+        Opens (or creates) the cache file at path, holding at most about
+        max_bytes of serialised Docs.
+        '''
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local() # one SQLite connection per thread
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS docs_last_used ON docs (last_used)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # WAL lets readers in other workers go on while one of them writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(model_key:str, text:str) -> str:
+        return hashlib.sha256(f"{model_key}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys:List[str], vocab) -> Dict[str, Doc]:
+        '''
+        Returns the cached Docs of the given keys (missing keys are left
+        out), restored onto vocab.
+        '''
+        found = {}
+        connection = self._connection()
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below SQLite's limit on query parameters
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(f"SELECT key, data FROM docs WHERE key IN ({placeholders})", chunk).fetchall()
+            for key, data in rows:
+                found[key] = next(iter(DocBin().from_bytes(data).get_docs(vocab)))
+        if found:
+            with connection:
+                connection.executemany(
+                    "UPDATE docs SET last_used = ? WHERE key = ?",
+                    [(time.time(), key) for key in found]
+                )
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def get(self, key:str, vocab) -> Optional[Doc]:
+        return self.get_many([key], vocab).get(key)
+
+    def put_many(self, items:Dict[str, Doc]):
+        '''
+        Stores Docs by key, replacing existing entries.
+        '''
+        if not items:
+            return
+        rows = []
+        now = time.time()
+        for key, doc in items.items():
+            doc_bin = DocBin(store_user_data=False)
+            doc_bin.add(doc)
+            data = doc_bin.to_bytes()
+            rows.append((key, data, len(data), now))
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO docs (key, data, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+        with self._lock:
+            self._writes += len(rows)
+            check = self._writes >= EVICTION_CHECK_INTERVAL
+            if check:
+                self._writes = 0
+        if check:
+            self.evict()
+
+    def put(self, key:str, doc:Doc):
+        self.put_many({key: doc})
+
+    def size_bytes(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM docs").fetchone()[0]
+
+    def evict(self):
+        '''
+        Deletes the least recently used Docs while the cache is larger
+        than max_bytes.
+        '''
+        connection = self._connection()
+        total = self.size_bytes()
+        if total <= self.max_bytes:
+            return
+        to_free = total - int(self.max_bytes * EVICTION_TARGET)
+        freed = 0
+        keys = []
+        for key, size in connection.execute("SELECT key, size FROM docs ORDER BY last_used"):
+            keys.append((key,))
+            freed += size
+            if freed >= to_free:
+                break
+        with connection:
+            connection.executemany("DELETE FROM docs WHERE key = ?", keys)
+        with self._lock:
+            self.evictions += len(keys)
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM docs")
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM docs"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "size_bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,80 @@
+'''
+Client helper for the bulk embedding endpoint (POST /embedding/batch).
+
+Vectors travel as raw little-endian float32 and are decoded with
+np.frombuffer, so the returned arrays are views on the response body
+instead of copies (they are read-only; copy them to modify them).
+
+    from embedding_client import fetch_embeddings
+    found, vectors = fetch_embeddings("http://localhost:8000", ["king", "queen", "qwzx"])
+    # found: bool array of shape (3,), vectors: float32 array of shape (3, 300)
+'''
+import base64
+from typing import List, Mapping, Tuple
+
+import numpy as np
+import requests
+
+# Words per request; the endpoint accepts up to 100000
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def decode_binary(body:bytes, headers:Mapping[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Decodes an application/octet-stream response: the found mask followed
+    by the float32 rows (see serialization.masked_float32_response).
+    '''
+    rows, dim = (int(n) for n in headers["X-Shape"].split(","))
+    offset = int(headers["X-Vectors-Offset"])
+    found = np.frombuffer(body, dtype=np.uint8, count=rows).view(bool)
+    vectors = np.frombuffer(body, dtype="<f4", count=rows * dim, offset=offset).reshape(rows, dim)
+    return found, vectors
+
+
+def decode_documents_binary(body:bytes, headers:Mapping[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Decodes an application/octet-stream response of POST /embedding/documents:
+    the float32 document vectors followed by the int32 known-token count of
+    each document (see serialization.counted_float32_response).
+    '''
+    rows, dim = (int(n) for n in headers["X-Shape"].split(","))
+    offset = int(headers["X-Counts-Offset"])
+    vectors = np.frombuffer(body, dtype="<f4", count=rows * dim).reshape(rows, dim)
+    known = np.frombuffer(body, dtype="<i4", count=rows, offset=offset)
+    return vectors, known
+
+
+def decode_json(payload:dict) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Decodes the default JSON response, with the rows base64 encoded.
+    '''
+    found = np.array(payload["found"], dtype=bool)
+    vectors = np.frombuffer(base64.b64decode(payload["vectors"]), dtype="<f4").reshape(len(found), payload["dim"])
+    return found, vectors
+
+
+def fetch_embeddings(base_url:str, words:List[str], session:requests.Session | None = None,
+                     chunk_size:int = DEFAULT_CHUNK_SIZE, timeout:float = 60) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Fetches the embeddings of words in chunks of chunk_size over the
+    binary transport. Returns (found mask, float32 matrix), one row per
+    word in input order, zeros for words that were not found. With a
+    single chunk both are zero-copy views on the response body.
+    '''
+    session = session or requests.Session()
+    url = base_url.rstrip("/") + "/embedding/batch"
+    parts = []
+    for start in range(0, len(words), chunk_size):
+        response = session.post(
+            url,
+            json={"words": words[start:start + chunk_size]},
+            headers={"Accept": "application/octet-stream"},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        parts.append(decode_binary(response.content, response.headers))
+    if not parts:
+        return np.zeros(0, dtype=bool), np.zeros((0, 0), dtype=np.float32)
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate([found for found, _ in parts]), np.concatenate([vectors for _, vectors in parts])
@@ -1,53 +1,263 @@
 import numpy as np
 from numpy import ndarray
 import os
+import threading
 from typing import List, Dict, Tuple, Set
 from preprocessing import Preprocessing
+from ann_index import AnnIndex
+from oov_index import NgramIndex
+from quantization import QuantizedMatrix, STORAGE_TYPES
+
+VOCAB_SUFFIX = ".vocab"
+# Rows normalised at a time when building the unit-length search matrix
+NORMALISE_CHUNK_ROWS = 65536
+# Queries scored together in batch search; each one holds V float32 scores
+QUERY_CHUNK_SIZE = 32
+# Close spellings averaged into the vector of an out-of-vocabulary word
+OOV_NEIGHBORS = 5
+# Ways get_document_embeddings can weight the tokens of a document
+DOCUMENT_WEIGHTINGS = ("mean", "tfidf", "sif")
+# SIF smoothing constant a in a / (a + p(w)), the value Arora et al. recommend
+SIF_A = 1e-3
+
+def binary_store_paths(prefix:str) -> Tuple[str, str]:
+    '''
+    Returns the (matrix, vocabulary) file paths of a binary GloVe store.
+    '''
+    return prefix + ".npy", prefix + VOCAB_SUFFIX
+
+def search_store_paths(prefix:str) -> Tuple[str, str]:
+    '''
+    Returns the (unit-normalised matrix, norms) file paths written next to
+    a binary GloVe store.
+    '''
+    return prefix + ".unit.npy", prefix + ".norms.npy"
+
+def convert_glove_to_binary(text_path:str, output_prefix:str | None = None) -> Tuple[str, str]:
+    '''
+    One-time conversion of a GloVe text file into a contiguous float32
+    matrix (<prefix>.npy) and a vocabulary file (<prefix>.vocab, one word
+    per line, row i of the matrix belongs to line i). Rows are streamed to
+    disk so the whole file is never held in memory. A word listed twice
+    keeps its last vector, as in Glove._load_text.
+    The L2-normalised search matrix (<prefix>.unit.npy) and the row norms
+    (<prefix>.norms.npy) are written too, so Glove memory-maps them instead
+    of building a private copy in every process.
+    '''
+    if output_prefix is None:
+        output_prefix = os.path.splitext(text_path)[0]
+    matrix_path, vocab_path = binary_store_paths(output_prefix)
+    raw_path = matrix_path + ".part"
+
+    word_rows: Dict[str, int] = {}
+    embedding_dim = None
+    with open(text_path, "r", encoding="utf-8") as src, \
+         open(raw_path, "wb") as raw:
+        for line_number, line in enumerate(src):
+            values = line.rstrip().split(" ")
+            if len(values) < 2:
+                continue # Skip empty lines
+            if embedding_dim is None:
+                embedding_dim = len(values) - 1
+            # Some GloVe releases contain words with spaces, the vector is always the last embedding_dim values
+            word = " ".join(values[:-embedding_dim])
+            try:
+                np_vector = np.asarray(values[-embedding_dim:], dtype=np.float32)
+            except ValueError as ve:
+                print(f" Line {line_number}: Could not convert embeddings to float - {ve}")
+                continue
+            if not word or len(np_vector) != embedding_dim:
+                print(f" Line {line_number}: Expected {embedding_dim} values, skipping")
+                continue
+            if word in word_rows:
+                # Later duplicates win: overwrite the word's row, then carry on appending
+                raw.seek(word_rows[word] * np_vector.nbytes)
+                raw.write(np_vector.tobytes())
+                raw.seek(0, os.SEEK_END)
+                continue
+            word_rows[word] = len(word_rows)
+            raw.write(np_vector.tobytes())
+
+    rows = len(word_rows)
+    with open(vocab_path, "w", encoding="utf-8") as vocab:
+        for word in word_rows: # Insertion order is row order
+            vocab.write(word + "\n")
+    matrix = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(rows, embedding_dim or 0))
+    np.save(matrix_path, matrix)
+    _write_search_store(matrix, output_prefix)
+    del matrix
+    os.remove(raw_path)
+    return matrix_path, vocab_path
+
+def _write_search_store(vectors:ndarray, prefix:str):
+    '''
+    Writes the unit-length rows and the norms of vectors, in chunks. Zero
+    vectors stay zero, as in Glove._get_search_matrix.
+    '''
+    unit_path, norms_path = search_store_paths(prefix)
+    unit = np.lib.format.open_memmap(unit_path, mode="w+", dtype=np.float32, shape=vectors.shape)
+    all_norms = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), NORMALISE_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + NORMALISE_CHUNK_ROWS], dtype=np.float32)
+        norms = np.linalg.norm(chunk, axis=1)
+        all_norms[start:start + len(chunk)] = norms
+        norms[norms == 0] = 1
+        unit[start:start + len(chunk)] = chunk / norms[:, None]
+    unit.flush()
+    del unit
+    np.save(norms_path, all_norms)
 
 class Glove:
-    def __init__(self,glove_file_path:str):
+    def __init__(self,glove_file_path:str, storage:str = "float32"):
         '''
-        Initialize the embedding index
+        Initialize the embedding index.
+        glove_file_path can be a GloVe text file or the .npy matrix of a
+        binary store. For a text file, a binary store next to it with the
+        same name (e.g. glove.6B.300d.npy + glove.6B.300d.vocab) is
+        preferred when it exists.
+        storage ("float32", "float16" or "int8") is the dtype of the
+        normalised search matrix. With a compact storage the matrix is
+        built at load time and, unless the raw vectors are memory-mapped,
+        the float32 vectors are released and embeddings are rebuilt from
+        the compact rows.
         '''
-        self.embeddings_index = {}
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGE_TYPES}")
+        self.words: List[str] = []
+        self.word_index: Dict[str, int] = {}
+        self.vectors: ndarray | None = None
         self.embedding_dim = None
+        self.storage = storage
+        self._search_matrix: QuantizedMatrix | None = None
+        self._norms: ndarray | None = None
+        # Unit-normalised matrix and norms memory-mapped from a binary store
+        self._unit_vectors: ndarray | None = None
+        self._stored_norms: ndarray | None = None
+        self._search_lock = threading.Lock()
+        self.ann_indexes: Dict[str, AnnIndex] = {}
+        self.oov_index: NgramIndex | None = None
         
         self._load_embeddings(glove_file_path)
-    
-    def _load_embeddings(self,file_path:str):
+        if storage != "float32" and self.vectors is not None:
+            self._get_search_matrix()
+            if not isinstance(self.vectors, np.memmap):
+                self.vectors = None
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _load_embeddings(self, file_path:str):
         '''
-        Parses the GloVe word-embeddings file and fills
-        self.embedding_index
+        Loads the binary store when one is available, otherwise parses the
+        text file.
         '''
+        if file_path.endswith(".npy"):
+            self._load_binary(file_path, file_path[:-len(".npy")] + VOCAB_SUFFIX)
+            return
+        matrix_path, vocab_path = binary_store_paths(os.path.splitext(file_path)[0])
+        if os.path.exists(matrix_path) and os.path.exists(vocab_path):
+            self._load_binary(matrix_path, vocab_path)
+        else:
+            self._load_text(file_path)
+
+    def _load_binary(self, matrix_path:str, vocab_path:str):
+        '''
+        Opens a binary store. The matrices are memory-mapped read-only, so
+        startup does not read the vectors and every process that opens
+        the same files shares one page-cached copy. Stores converted before
+        the unit-normalised matrix was written still load; their search
+        matrix is built in process.
+        '''
+        try:
+            with open(vocab_path, "r", encoding="utf-8") as f:
+                words = f.read().split("\n")[:-1]
+            vectors = np.load(matrix_path, mmap_mode="r")
+        except FileNotFoundError as e:
+            print(f"File Not Found: {e.filename}")
+            return
+        if len(words) != vectors.shape[0]:
+            raise ValueError(
+                f"{vocab_path} has {len(words)} words but {matrix_path} has {vectors.shape[0]} rows"
+            )
+        self.words = words
+        self.word_index = {word: i for i, word in enumerate(words)}
+        self.vectors = vectors
+        self.embedding_dim = vectors.shape[1]
+
+        unit_path, norms_path = search_store_paths(matrix_path[:-len(".npy")])
+        if os.path.exists(unit_path) and os.path.exists(norms_path):
+            unit_vectors = np.load(unit_path, mmap_mode="r")
+            stored_norms = np.load(norms_path, mmap_mode="r")
+            if unit_vectors.shape != vectors.shape or stored_norms.shape != (len(words),):
+                raise ValueError(f"{unit_path} and {norms_path} do not match {matrix_path}, convert it again")
+            self._unit_vectors = unit_vectors
+            self._stored_norms = stored_norms
+
+    def _load_text(self,file_path:str):
+        '''
+        Parses the GloVe word-embeddings file and fills the vocabulary
+        and the embedding matrix. Use convert_glove_to_binary() once to
+        avoid this slow path on every start.
+        '''
+        rows = []
         try:
             with open(file_path, "r",encoding='utf-8') as f:
                 for line_number,line in enumerate(f):
-                    line = line.strip()
-                    if not line:
+                    values = line.rstrip().split(" ")
+                    if len(values) < 2:
                         continue # Skip empty lines 
-                    values = line.split()
-                    word = values[0]
-                    embeddings = values[1:]
+                    if self.embedding_dim is None:
+                        self.embedding_dim = len(values) - 1
+                    # Same parse as convert_glove_to_binary: words may contain spaces, the vector is always the last embedding_dim values
+                    word = " ".join(values[:-self.embedding_dim])
+                    embeddings = values[-self.embedding_dim:]
                     try:
                         np_vector = np.asarray(embeddings, dtype = np.float32)
-                        if self.embedding_dim is None:
-                            self.embedding_dim = len(np_vector)
-                        self.embeddings_index[word] = np_vector
+                        if not word or len(np_vector) != self.embedding_dim:
+                            print(f" Line {line_number}: Expected {self.embedding_dim} values, skipping")
+                            continue
+                        if word in self.word_index:
+                            rows[self.word_index[word]] = np_vector # Later duplicates win
+                            continue
+                        self.word_index[word] = len(self.words)
+                        self.words.append(word)
+                        rows.append(np_vector)
                     except ValueError as ve:
                         print(f" Line {line_number}: Could not convert embeddings to float - {ve}")
-                    
-                #self.embedding_dim = len(np_vector)
         except FileNotFoundError:
             print(f"File Not Found: {file_path}") 
-
-        
-
+            return
+        if rows:
+            self.vectors = np.vstack(rows)
 
     def get_embedding(self,word:str) -> ndarray | None:
         '''
         Returns the embedding vector for a given word
         '''
-        return self.embeddings_index.get(word,None)
+        index = self.word_index.get(word)
+        if index is None:
+            return None
+        return self._row_vector(index)
+
+    def _row_vector(self, index:int) -> ndarray:
+        if self.vectors is not None:
+            return self.vectors[index]
+        # Compact storage without raw vectors: unit row times its norm
+        return self._search_matrix.rows([index])[0] * self._norms[index]
+
+    def memory_bytes(self) -> int:
+        '''
+        Bytes of embedding data held in this process. Memory-mapped vectors
+        live in the shared page cache and are not counted.
+        '''
+        total = 0
+        if self.vectors is not None and not isinstance(self.vectors, np.memmap):
+            total += self.vectors.nbytes
+        if self._search_matrix is not None and not isinstance(self._search_matrix.data, np.memmap):
+            total += self._search_matrix.nbytes
+        if self._norms is not None and not isinstance(self._norms, np.memmap):
+            total += self._norms.nbytes
+        return total
     
     def cosine_similarity(self,vec_A:ndarray, vec_B:ndarray ) -> float:
         '''
@@ -66,20 +276,392 @@ class Glove:
             similarity = (dot_product)/(norm_A*norm_B)
             return float(similarity)
     
-    def get_nearest_neighbors(self, word: str, top_n: int) -> List[Tuple[str, float]]:
-        similarity_score = {}
+    def get_nearest_neighbors(self, word: str, top_n: int, backend: str = "exact") -> List[Tuple[str, float]]:
+        '''
+        Returns the top_n words with the highest cosine similarity to word,
+        excluding the word itself. The exact backend gets all scores from
+        one matrix-vector product against the L2-normalised matrix; any
+        other backend names a loaded ANN index (see load_ann_index).
+        '''
         processed_word = word.lower() # Process input word once
 
-        #Check for word existence and get its embedding
+        #Check for word existence and get its row
+        index = self.word_index.get(processed_word)
+        if index is None:
+            print(f"Debug: Word '{processed_word}' not found by get_embedding.") # Optional debug
+            return []
+
+        if backend != "exact":
+            return self._search_rows([[index]], lambda rows: rows[0], top_n, QUERY_CHUNK_SIZE, backend)[0]
+
+        scores = self._get_search_matrix().dot(self._unit_rows([index]))[0]
+        return self._top_n(scores, top_n, exclude=[index])
+
+    def get_nearest_neighbors_batch(self, words: List[str], top_n: int,
+                                    chunk_size: int = QUERY_CHUNK_SIZE,
+                                    backend: str = "exact") -> List[List[Tuple[str, float]]]:
+        '''
+        Returns the nearest neighbours of many words in one call, in input
+        order. Words that are not in the vocabulary get an empty list.
+        '''
+        indices = [self.word_index.get(word.lower()) for word in words]
+        return self._search_rows(
+            [[index] if index is not None else None for index in indices],
+            lambda rows: rows[0],
+            top_n,
+            chunk_size,
+            backend
+        )
+
+    def get_analogies(self, triples: List[Tuple[str, str, str]], top_n: int,
+                      chunk_size: int = QUERY_CHUNK_SIZE,
+                      backend: str = "exact") -> List[List[Tuple[str, float]]]:
+        '''
+        Answers "a - b + c" analogy queries (e.g. king - man + woman) in one
+        call. The three query words are excluded from the results and
+        triples with an unknown word get an empty list.
+        '''
+        triple_indices = []
+        for triple in triples:
+            indices = [self.word_index.get(word.lower()) for word in triple]
+            triple_indices.append(None if None in indices else indices)
+
+        def analogy_vector(rows):
+            query = rows[0] - rows[1] + rows[2]
+            norm = np.linalg.norm(query)
+            return query / norm if norm > 0 else query
+
+        return self._search_rows(triple_indices, analogy_vector, top_n, chunk_size, backend)
+
+    def get_document_embeddings(self, token_lists: List[List[str]], weighting: str = "mean",
+                                sif_a: float = SIF_A) -> Tuple[ndarray, ndarray]:
+        '''
+        Aggregates the token vectors of every document (a list of tokens)
+        into one float32 vector per document. The rows of all known tokens
+        of all documents are gathered from the matrix in one go.
+            mean   average of the token vectors
+            tfidf  average weighted by term frequency times the smoothed
+                   idf of the token over the given documents
+            sif    average weighted by a / (a + p(w)), then the component
+                   common to the documents is removed (Arora et al., 2017)
+        p(w) is estimated from the vocabulary rank with Zipf's law, since
+        GloVe files list words from most to least frequent. Documents with
+        no known token get a zero vector.
+        Returns (vectors, number of known tokens of each document).
+        '''
+        if weighting not in DOCUMENT_WEIGHTINGS:
+            raise ValueError(f"Unknown weighting '{weighting}', expected one of {DOCUMENT_WEIGHTINGS}")
+        doc_ids = []
+        rows = []
+        for doc_id, tokens in enumerate(token_lists):
+            for token in tokens:
+                index = self.word_index.get(token.lower())
+                if index is not None:
+                    doc_ids.append(doc_id)
+                    rows.append(index)
+        n_docs = len(token_lists)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        known = np.bincount(doc_ids, minlength=n_docs)
+        result = np.zeros((n_docs, self.embedding_dim or 0), dtype=np.float32)
+        if len(rows) == 0:
+            return result, known
+
+        weights = self._token_weights(doc_ids, rows, n_docs, weighting, sif_a)
+        weighted = self._raw_rows(rows) * weights[:, None]
+        # doc_ids is sorted, so every document is one contiguous segment
+        starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+        present = doc_ids[starts]
+        result[present] = np.add.reduceat(weighted, starts) / np.add.reduceat(weights, starts)[:, None]
+
+        if weighting == "sif" and len(present) > 1:
+            # Remove the projection on the first singular vector
+            _, _, vt = np.linalg.svd(result[present], full_matrices=False)
+            component = vt[0]
+            result[present] -= np.outer(result[present] @ component, component)
+        return result, known
+
+    def _token_weights(self, doc_ids: ndarray, rows: ndarray, n_docs: int, weighting: str, sif_a: float) -> ndarray:
+        if weighting == "mean":
+            return np.ones(len(rows), dtype=np.float32)
+        if weighting == "tfidf":
+            # Document frequency: distinct (document, row) pairs per row
+            vocab_size = len(self.words)
+            pair_rows = np.unique(doc_ids * vocab_size + rows) % vocab_size
+            unique_rows, df = np.unique(pair_rows, return_counts=True)
+            idf = np.log((1 + n_docs) / (1 + df)) + 1
+            return idf[np.searchsorted(unique_rows, rows)].astype(np.float32)
+        # Zipf: p(rank r) = 1 / (r * H_V), with H_V ~ ln V + Euler-Mascheroni
+        harmonic = np.log(len(self.words)) + 0.5772
+        p = 1.0 / ((rows + 1) * harmonic)
+        return (sif_a / (sif_a + p)).astype(np.float32)
+
+    def get_embeddings(self, words: List[str]) -> Tuple[ndarray, ndarray]:
+        '''
+        Looks up many words at once. Returns a float32 matrix with one row
+        per word (zeros for unknown words) and a boolean found mask.
+        '''
+        indices = [self.word_index.get(word) for word in words]
+        found = np.array([index is not None for index in indices], dtype=bool)
+        matrix = np.zeros((len(words), self.embedding_dim or 0), dtype=np.float32)
+        if found.any():
+            matrix[found] = self._raw_rows(np.array([index for index in indices if index is not None]))
+        return matrix, found
+
+    def _raw_rows(self, rows) -> ndarray:
+        '''
+        Returns the (unnormalised) float32 vectors of the given rows.
+        '''
+        if self.vectors is not None:
+            return np.asarray(self.vectors[rows], dtype=np.float32)
+        # Compact storage without raw vectors: unit rows times their norms
+        return self._search_matrix.rows(rows) * self._norms[rows][:, None]
+
+    def build_ann_index(self, index_type: str = "hnsw", path: str | None = None, **params) -> AnnIndex:
+        '''
+        Builds an approximate nearest-neighbour index over the normalised
+        matrix, registers it as a backend named after its type and saves it
+        to path when one is given. params are passed to AnnIndex.build.
+        '''
+        ann_index = AnnIndex.build(self._get_unit_vectors(), index_type, **params)
+        if path is not None:
+            ann_index.save(path)
+        self.ann_indexes[ann_index.index_type] = ann_index
+        return ann_index
+
+    def load_ann_index(self, path: str, **params) -> AnnIndex:
+        '''
+        Loads an index written by build_ann_index and registers it as a
+        backend named after its type.
+        '''
+        ann_index = AnnIndex.load(path, **params)
+        if len(ann_index) != len(self):
+            raise ValueError(f"{path} indexes {len(ann_index)} vectors but the vocabulary has {len(self)} words")
+        self.ann_indexes[ann_index.index_type] = ann_index
+        return ann_index
+
+    def build_oov_index(self, path: str | None = None, **params) -> NgramIndex:
+        '''
+        Builds the character n-gram index used for out-of-vocabulary words
+        (see oov_index.py) and saves it to path when one is given. params
+        are passed to NgramIndex.build.
+        '''
+        oov_index = NgramIndex.build(self.words, **params)
+        if path is not None:
+            oov_index.save(path)
+        self.oov_index = oov_index
+        return oov_index
+
+    def load_oov_index(self, path: str) -> NgramIndex:
+        '''
+        Loads an index written by build_oov_index.
+        '''
+        oov_index = NgramIndex.load(path)
+        if len(oov_index) > len(self):
+            raise ValueError(f"{path} indexes {len(oov_index)} words but the vocabulary has {len(self)} words")
+        self.oov_index = oov_index
+        return oov_index
+
+    def similar_spellings(self, word: str, top_n: int = OOV_NEIGHBORS) -> List[Tuple[str, float]]:
+        '''
+        Returns up to top_n (vocabulary word, similarity) pairs spelled most
+        like word, best first. Empty without an OOV index.
+        '''
+        if self.oov_index is None:
+            return []
+        return [(self.words[row], similarity) for row, similarity in self.oov_index.search(word.lower(), top_n)]
+
+    def resolve_word(self, word: str) -> str | None:
+        '''
+        Returns word (lowercased) if it is in the vocabulary, otherwise its
+        closest spelling in the vocabulary, or None.
+        '''
+        processed_word = word.lower()
+        if processed_word in self.word_index:
+            return processed_word
+        spellings = self.similar_spellings(processed_word, top_n=1)
+        return spellings[0][0] if spellings else None
+
+    def get_oov_embedding(self, word: str, top_n: int = OOV_NEIGHBORS) -> Tuple[ndarray | None, List[Tuple[str, float]]]:
+        '''
+        Returns the embedding of word, or for an unknown word the average of
+        the vectors of its top_n closest spellings weighted by similarity,
+        together with those spellings. (None, []) when nothing is close.
+        '''
+        vector = self.get_embedding(word.lower())
+        if vector is not None:
+            return vector, []
+        spellings = self.similar_spellings(word, top_n)
+        if not spellings:
+            return None, []
+        weights = np.array([similarity for _, similarity in spellings], dtype=np.float32)
+        vectors = self._raw_rows(np.array([self.word_index[w] for w, _ in spellings]))
+        return (weights @ vectors) / weights.sum(), spellings
+
+    def backends(self) -> List[str]:
+        '''
+        Names of the search backends that can currently be used.
+        '''
+        return ["exact"] + sorted(self.ann_indexes)
+
+    def _search_rows(self, row_groups, make_query, top_n: int, chunk_size: int,
+                     backend: str = "exact") -> List[List[Tuple[str, float]]]:
+        '''
+        Shared batch search. row_groups holds the vocabulary rows of each
+        query (None when a word is unknown), make_query turns their unit
+        vectors into one unit-length query vector and those rows are
+        excluded from the results. Exact queries are scored chunk_size at
+        a time with a single matrix-matrix product against the search
+        matrix, so at most chunk_size x V scores are held in memory.
+        '''
+        if backend != "exact" and backend not in self.ann_indexes:
+            raise ValueError(f"Search backend '{backend}' is not available, expected one of {self.backends()}")
+        results = [[] for _ in row_groups]
+        known = [i for i, rows in enumerate(row_groups) if rows is not None]
+        if not known or top_n <= 0:
+            return results
+
+        for start in range(0, len(known), chunk_size):
+            positions = known[start:start + chunk_size]
+            queries = np.stack([make_query(self._unit_rows(row_groups[i])) for i in positions])
+            excludes = [set(row_groups[i]) for i in positions]
+            if backend == "exact":
+                scores = self._get_search_matrix().dot(queries)
+                chunk_results = [
+                    self._top_n(row_scores, top_n, exclude)
+                    for row_scores, exclude in zip(scores, excludes)
+                ]
+            else:
+                chunk_results = self._ann_top_n(self.ann_indexes[backend], queries, top_n, excludes)
+            for position, neighbors in zip(positions, chunk_results):
+                results[position] = neighbors
+        return results
+
+    def _ann_top_n(self, ann_index: AnnIndex, queries: ndarray, top_n: int, excludes) -> List[List[Tuple[str, float]]]:
+        '''
+        Searches an ANN index, asking for enough extra results to drop the
+        excluded query rows.
+        '''
+        k = min(top_n + max(len(exclude) for exclude in excludes), len(self))
+        scores, ids = ann_index.search(queries, k)
+        results = []
+        for row_scores, row_ids, exclude in zip(scores, ids, excludes):
+            neighbors = [
+                (self.words[i], float(score))
+                for score, i in zip(row_scores, row_ids)
+                if i >= 0 and i not in exclude
+            ]
+            results.append(neighbors[:top_n])
+        return results
+
+    def _unit_rows(self, rows) -> ndarray:
+        '''
+        Returns the L2-normalised vectors of the given rows without building
+        the full normalised matrix, which ANN-only setups never need.
+        '''
+        if self._search_matrix is not None:
+            return self._search_matrix.rows(rows)
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _get_search_matrix(self) -> QuantizedMatrix:
+        '''
+        Returns the L2-normalised embedding matrix in the configured
+        storage. A binary store's float32 matrix is the memory-mapped
+        <prefix>.unit.npy, shared by every process. Otherwise it is built
+        once, on first use, in chunks so the raw matrix never has to be
+        copied as a whole. Zero vectors stay zero, which gives them a
+        similarity of 0 like cosine_similarity does.
+        '''
+        if self._search_matrix is None:
+            with self._search_lock:
+                if self._search_matrix is None:
+                    if self._unit_vectors is not None:
+                        self._search_matrix = self._stored_search_matrix()
+                    else:
+                        self._search_matrix = self._build_search_matrix()
+        return self._search_matrix
+
+    def _stored_search_matrix(self) -> QuantizedMatrix:
+        '''
+        Search matrix from a binary store's unit-normalised matrix: the
+        memory-mapped file itself for float32, otherwise a compact copy.
+        '''
+        if self.storage == "float32":
+            return QuantizedMatrix(self._unit_vectors)
+        search_matrix = QuantizedMatrix.empty(self._unit_vectors.shape, self.storage)
+        for start in range(0, len(self._unit_vectors), NORMALISE_CHUNK_ROWS):
+            search_matrix.set_rows(start, np.asarray(self._unit_vectors[start:start + NORMALISE_CHUNK_ROWS], dtype=np.float32))
+        self._norms = self._stored_norms # Needed to rebuild raw vectors from compact rows
+        return search_matrix
+
+    def _build_search_matrix(self) -> QuantizedMatrix:
+        '''
+        Normalises the raw vectors into a search matrix held in this process.
+        '''
+        search_matrix = QuantizedMatrix.empty(self.vectors.shape, self.storage)
+        all_norms = np.empty(len(self.vectors), dtype=np.float32)
+        for start in range(0, len(self.vectors), NORMALISE_CHUNK_ROWS):
+            chunk = np.asarray(self.vectors[start:start + NORMALISE_CHUNK_ROWS], dtype=np.float32)
+            norms = np.linalg.norm(chunk, axis=1)
+            all_norms[start:start + len(chunk)] = norms
+            norms[norms == 0] = 1
+            search_matrix.set_rows(start, chunk / norms[:, None])
+        if self.storage != "float32":
+            self._norms = all_norms # Needed to rebuild raw vectors from compact rows
+        return search_matrix
+
+    def _get_unit_vectors(self) -> ndarray:
+        '''
+        Returns the normalised matrix as float32, e.g. to build an ANN
+        index. For compact storage this is a temporary full-size copy,
+        unless a binary store has the float32 rows on disk.
+        '''
+        if self._unit_vectors is not None:
+            return self._unit_vectors
+        search_matrix = self._get_search_matrix()
+        if search_matrix.storage == "float32":
+            return search_matrix.data
+        return search_matrix.rows(slice(None))
+
+    def _top_n(self, scores: ndarray, top_n: int, exclude=()) -> List[Tuple[str, float]]:
+        '''
+        Picks the top_n highest scores with np.argpartition and returns them
+        as (word, score) pairs, best first. Equal scores are ordered by
+        vocabulary position, the same order a stable full sort gives.
+        '''
+        scores = scores.copy()
+        scores[list(exclude)] = -np.inf
+        k = min(top_n, len(scores) - len(exclude))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        kth_score = scores[candidates].min()
+        # argpartition breaks ties at the boundary arbitrarily, so rebuild the set
+        above = np.flatnonzero(scores > kth_score)
+        ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+        top = np.concatenate([above, ties])
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(self.words[i], float(scores[i])) for i in top]
+
+    def _nearest_neighbors_reference(self, word: str, top_n: int) -> List[Tuple[str, float]]:
+        '''
+        Original pair-by-pair implementation of get_nearest_neighbors. It is
+        O(V) Python calls and only kept to check the vectorised results.
+        '''
+        similarity_score = {}
+        processed_word = word.lower()
+
         input_embedding = self.get_embedding(processed_word)
         if input_embedding is None:
-            print(f"Debug: Word '{processed_word}' not found by get_embedding.") # Optional debug
             return []
 
-        
-        for candidate_word, candidate_embedding in self.embeddings_index.items():
-            if candidate_word == processed_word: # Compare with the processed_word
+        for index, candidate_word in enumerate(self.words):
+            if candidate_word == processed_word:
                 continue
+            candidate_embedding = self._row_vector(index)
 
             score = self.cosine_similarity(input_embedding, candidate_embedding)
             similarity_score[candidate_word] = score
@@ -115,8 +697,8 @@ if __name__ == "__main__":
         print(f"Attempting to load embeddings from: {glove_file_to_test}")
         my_glove_model = Glove(glove_file_path=glove_file_to_test)
 
-        if my_glove_model.embeddings_index:
-            print(f"Loaded {len(my_glove_model.embeddings_index)} vectors") 
+        if len(my_glove_model):
+            print(f"Loaded {len(my_glove_model)} vectors") 
              
             print(f"Embeddings dimensions: {my_glove_model.embedding_dim}")
 
@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Set
+
+
+class Overloaded(Exception):
+    '''
+    Raised when the executor already holds as many calls as it admits.
+    '''
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers:int, max_queue:int, use_processes:bool = True, initializer=None):
+        '''
+        Runs CPU-heavy calls on a dedicated pool so they never block the
+        event loop. At most max_workers calls run at once and at most
+        max_queue more wait for a worker; anything beyond that is rejected
+        straight away with Overloaded instead of queueing without bound.
+        With use_processes=False a thread pool is used instead, which keeps
+        everything in one process (useful for development).
+        '''
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.use_processes = use_processes
+        self.initializer = initializer
+        self._pool = None
+        # Only touched from the event loop thread, so no lock is needed
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def start(self):
+        if self.use_processes:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn, *args, **kwargs):
+        '''
+        Runs fn(*args, **kwargs) on the pool and returns its result.
+        '''
+        if self._pool is None:
+            raise RuntimeError("Executor is not started.")
+        if self._in_flight >= self.capacity:
+            self.rejected += 1
+            raise Overloaded(f"Server is overloaded ({self._in_flight} requests in progress), try again later.")
+        self._in_flight += 1
+        pool = self._pool
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+            self.completed += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool once for later calls
+            if self._pool is pool:
+                self.shutdown()
+                self.start()
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def broadcast(self, fn) -> List:
+        '''
+        Submits fn max_workers times at the same time and returns the
+        results of the calls that succeeded. Concurrent calls are usually
+        spread over the workers, but a worker can take more than one, so
+        callers must not assume every worker answered (see worker_pids).
+        Called at startup, it makes the pool start all of its workers (and
+        their initializers) instead of waiting for the first requests. Not
+        subject to admission control.
+        '''
+        if self._pool is None:
+            raise RuntimeError("Executor is not started.")
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[loop.run_in_executor(self._pool, fn) for _ in range(self.max_workers)],
+            return_exceptions=True
+        )
+        return [result for result in results if not isinstance(result, BaseException)]
+
+    def worker_pids(self) -> Set[int]:
+        '''
+        Process ids of the pool's live workers (this process for a thread
+        pool). Empty until the pool has started its workers.
+        '''
+        if self._pool is None:
+            return set()
+        if not self.use_processes:
+            return {os.getpid()}
+        # ProcessPoolExecutor starts its workers lazily and keeps them by pid
+        processes = getattr(self._pool, "_processes", None) or {}
+        return {pid for pid, process in list(processes.items()) if process.is_alive()}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "capacity": self.capacity,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
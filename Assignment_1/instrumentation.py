@@ -0,0 +1,112 @@
+'''
+Per-request latency instrumentation of the API.
+
+Worker code times its stages with `stage(name)` (spaCy parse, stemming,
+GloVe lookup, neighbour search). workers.instrumented_call collects them
+and sends them back to the API process with the result, where they are
+added to the request's timings together with
+    queue          waiting for a worker, including the transfer of
+                   arguments and results between processes
+    serialization  from the last worker result to the finished response
+                   (response models, validation and encoding)
+The HTTP middleware in main.py records every request as Prometheus
+histograms, served on /metrics.
+'''
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+from prometheus_client import Histogram
+
+# Sub-millisecond buckets too: tokenizing a short text takes well under 1ms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_SECONDS = Histogram(
+    "nlp_api_request_seconds",
+    "Time to answer a request, by endpoint.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "nlp_api_stage_seconds",
+    "Time spent in each stage of a request, by endpoint and stage.",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Stage timings of the worker call running on this thread
+_local = threading.local()
+
+
+@contextmanager
+def stage(name:str):
+    '''
+    Adds the time spent in the block to the current worker call's stage
+    timings. Does nothing outside of collect_stages.
+    '''
+    timings = getattr(_local, "timings", None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def collect_stages():
+    '''
+    Collects the stage timings of the calls made in the block into the
+    yielded dictionary.
+    '''
+    previous = getattr(_local, "timings", None)
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+class RequestTimings:
+    def __init__(self):
+        '''
+        Stage timings of one request in the API process.
+        '''
+        self.stages: Dict[str, float] = {}
+        self.last_worker_result = None # perf_counter() when the last worker call returned
+
+    def add(self, stages:Dict[str, float]):
+        for name, seconds in stages.items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.last_worker_result = time.perf_counter()
+
+
+_request_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def current_request() -> RequestTimings | None:
+    return _request_timings.get()
+
+
+def observe(endpoint:str, seconds:float, stages:Dict[str, float]):
+    REQUEST_SECONDS.labels(endpoint=endpoint).observe(seconds)
+    observe_stages(endpoint, stages)
+
+
+def observe_stages(endpoint:str, stages:Dict[str, float]):
+    '''
+    Records stage timings on their own, for work that finishes after the
+    response has started (the batches of a streamed response).
+    '''
+    for name, stage_seconds in stages.items():
+        STAGE_SECONDS.labels(endpoint=endpoint, stage=name).observe(stage_seconds)
@@ -1,26 +1,81 @@
 from fastapi.middleware.cors import CORSMiddleware
-from preprocessing import Preprocessing
-from embeddings import Glove
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from preprocessing import TASKS
+from cache import NeighborCache
+from executor import BoundedExecutor, Overloaded
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
+import workers
+import instrumentation
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from fastapi import FastAPI, Query, Request, Response
+from streaming import NDJSONStreamingResponse, iter_ndjson_batches
+from serialization import counted_float32_response, encode_response, masked_float32_response, wants_octet_stream
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal, Optional, Tuple
 from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+import asyncio
+import base64
+import json
 import logging
-from numpy import ndarray
+import os
+import time
+import numpy as np
 
 class EmbeddingOut(BaseModel):
     word: str
     embeddings: Optional[List[float]] = None # Default to none if no embedding found
     found: bool = False
+    # Vocabulary words the embedding of an unknown word was composed from (?fallback=true)
+    similar_words: Optional[List[str]] = None
 class NeighborsOut(BaseModel):
 
     word: str
     similarity: float
 
+class NeighborsBatchIn(BaseModel):
+    words: List[str] = Field(default_factory=list, max_length=10000)
+    analogies: List[Tuple[str, str, str]] = Field(default_factory=list, max_length=10000) # (a, b, c) is answered as a - b + c
+    top_n: int = Field(5, ge=1, le=1000)
+    backend: str = "exact" # "exact" or a loaded ANN index type ("hnsw", "ivf_flat")
+
+class NeighborsQueryOut(BaseModel):
+    query: str
+    found: bool
+    neighbors: List[NeighborsOut]
+
+class WordsIn(BaseModel):
+    words: List[str] = Field(..., max_length=100000)
+
+class EmbeddingsBatchOut(BaseModel):
+    dim: int
+    found: List[bool]
+    vectors: str # base64 of the little-endian float32 rows, zeros for missing words
+
+class DocumentsIn(BaseModel):
+    texts: List[str] = Field(..., max_length=10000)
+    weighting: Literal["mean", "tfidf", "sif"] = "mean"
+    batch_size: int = Field(64, ge=1, le=10000)
+
+class DocumentEmbeddingOut(BaseModel):
+    vector: List[float]
+    tokens: int
+    known_tokens: int
+
+class DocumentEmbeddingsOut(BaseModel):
+    weighting: str
+    dim: int
+    documents: List[DocumentEmbeddingOut]
+
 class TextIn(BaseModel):
     
     text: str
 
+class BatchTextIn(BaseModel):
+    texts: List[str] = Field(..., max_length=10000)
+    batch_size: int = Field(64, ge=1, le=10000) # Documents per nlp.pipe batch
+    n_process: int = Field(1, ge=1) # Worker processes used by nlp.pipe, capped at NLP_BATCH_MAX_PROCESSES
+
 class LemmaOut(BaseModel):
     text: str
     lemma: str
@@ -33,12 +88,12 @@ class PosTag(BaseModel):
     text: str
     pos_tag: str
     tag: str
-    explanation: str
+    explanation: Optional[str] # spacy.explain knows most, not all, tags
 
 class NER(BaseModel):
     text: str
     label: str
-    explanation: str
+    explanation: Optional[str]
 
 class AllNlpResults(BaseModel):
     original_text: str
@@ -48,10 +103,20 @@ class AllNlpResults(BaseModel):
     pos_tags: List[PosTag]
     named_entities: List[NER]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load in the background inside the workers, so the API accepts
+    # requests straight away; /health/ready reports when they are loaded.
+    executor.start()
+    app.state.warm_up = asyncio.create_task(_refresh_worker_status(timeout=None))
+    yield
+    executor.shutdown()
+
 # Creating an instance of FastAPI
 app = FastAPI (
     title= "NLP Preprocessing API",
     description= "An API to perform various MLP preprocessing tasks.",
+    lifespan= lifespan,
     )
 
 # --- CORS Configuration --- 
@@ -73,18 +138,183 @@ app.add_middleware(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-preprocessor = Preprocessing()
-glove_model = Glove("Glove_file_path")
+# CPU-heavy work runs on a bounded pool of worker processes, each holding
+# its own models (see workers.py). Requests beyond the pool's capacity get
+# a 503 straight away. NLP_WORKER_PROCESSES=0 uses threads in this process.
+# Every worker loads its own spaCy model and GloVe search matrix, so memory
+# grows with the worker count; the default is small and fixed rather than
+# the host's core count.
+NLP_WORKER_PROCESSES = int(os.environ.get("NLP_WORKER_PROCESSES", "2"))
+NLP_MAX_QUEUED = int(os.environ.get("NLP_MAX_QUEUED", str(4 * max(NLP_WORKER_PROCESSES, 1))))
+# Extra spaCy processes one batch request may start inside its worker with
+# nlp.pipe(n_process=...). They are not counted by the executor and each one
+# loads its own model, so the default keeps batches in their worker.
+NLP_BATCH_MAX_PROCESSES = max(int(os.environ.get("NLP_BATCH_MAX_PROCESSES", "1")), 1)
+executor = BoundedExecutor(
+    max_workers = max(NLP_WORKER_PROCESSES, 1),
+    max_queue = NLP_MAX_QUEUED,
+    use_processes = NLP_WORKER_PROCESSES > 0,
+    initializer = workers.init_worker,
+)
+
+# Load state of every worker's models by pid, kept here so the readiness
+# probe does not depend on which worker takes a call, nor on a free worker
+worker_status: Dict[int, dict] = {}
+# How long the readiness probe waits for workers it has no final state for
+READINESS_REFRESH_SECONDS = float(os.environ.get("READINESS_REFRESH_SECONDS", "2"))
+
+# Nearest-neighbor results are cached per (word, backend), see cache.py
+NEIGHBOR_CACHE_SIZE = int(os.environ.get("NEIGHBOR_CACHE_SIZE", "10000"))
+NEIGHBOR_CACHE_TTL = float(os.environ.get("NEIGHBOR_CACHE_TTL", "0")) or None # Seconds, 0 disables expiry
+neighbor_cache = NeighborCache(maxsize=NEIGHBOR_CACHE_SIZE, ttl_seconds=NEIGHBOR_CACHE_TTL)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    '''
+    Times every request and its stages (see instrumentation.py) into the
+    Prometheus histograms served on /metrics.
+    '''
+    timings = instrumentation.start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    end = time.perf_counter()
+    if timings.last_worker_result is not None:
+        timings.stages["serialization"] = end - timings.last_worker_result
+    route = request.scope.get("route")
+    # Route templates, not raw paths, so /embedding/{word_input} is one series
+    endpoint = route.path if route is not None else "unmatched"
+    instrumentation.observe(endpoint, end - start, timings.stages)
+    stage_summary = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.stages.items())
+    logger.info(f"{request.method} {endpoint} {response.status_code} in {(end - start) * 1000:.1f}ms"
+    f"{f' ({stage_summary})' if stage_summary else ''}")
+    return response
+
+async def _instrumented_run(fn, *args):
+    '''
+    Runs fn(*args) on the executor through workers.instrumented_call and
+    returns (result, stage timings), the latter including the queue time.
+    '''
+    submitted = time.perf_counter()
+    result, stages, worker_seconds = await executor.run(workers.instrumented_call, fn, *args)
+    return result, {**stages, "queue": time.perf_counter() - submitted - worker_seconds}
+
+async def run_cpu(fn, *args):
+    '''
+    Runs fn(*args) on the executor. A full executor, a worker that died
+    (e.g. killed for memory; the pool is replaced) and a model that could
+    not be loaded are reported as 503; an invalid argument raised by the
+    worker (ValueError) is reported as 400.
+    '''
+    try:
+        result, stages = await _instrumented_run(fn, *args)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except BrokenProcessPool:
+        raise HTTPException(
+            status_code=503,
+            detail="A worker process stopped unexpectedly, try again later.",
+            headers={"Retry-After": "1"}
+        )
+    except workers.ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timings = instrumentation.current_request()
+    if timings is not None:
+        timings.add(stages)
+    return result
+
+async def _cached_neighbors(words: List[str], top_n: int, backend: str):
+    '''
+    Returns (found, neighbors) for every word, answering from neighbor_cache
+    where possible and searching the rest in one batch on the executor.
+    '''
+    results = []
+    for word in words:
+        cached = neighbor_cache.get(word, top_n, backend)
+        results.append((True, cached) if cached is not None else None)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = await run_cpu(
+            workers.nearest_neighbors_batch, [words[i] for i in missing], top_n, backend
+        )
+        for i, (found, neighbor_tuples) in zip(missing, computed):
+            results[i] = (found, neighbor_tuples)
+            if found: # Unknown words are cheap, don't cache them
+                neighbor_cache.put(words[i], top_n, backend, neighbor_tuples)
+    return results
 
 # Check if API is running. 
 
 @app.get("/")
 
-def read_root():
+async def read_root():
     return {"message": "Welcome to NLP pre-processing API"}
 
+
+@app.get("/health/live")
+async def api_liveness():
+    """
+    Liveness probe: the API process is up and its event loop responds.
+    Does not touch the models.
+    """
+    return {"status": "alive"}
+
+
+async def _refresh_worker_status(timeout: float | None = READINESS_REFRESH_SECONDS):
+    '''
+    Asks the workers for their load state (outside admission control) and
+    records it in worker_status. Gives up after timeout seconds, keeping
+    what is already known, e.g. while every worker is busy.
+    '''
+    try:
+        results = await asyncio.wait_for(executor.broadcast(workers.resource_status), timeout)
+    except asyncio.TimeoutError:
+        results = []
+    for status in results:
+        worker_status[status["pid"]] = status["resources"]
+    # Forget workers that have been replaced
+    live_pids = executor.worker_pids()
+    for pid in list(worker_status):
+        if pid not in live_pids:
+            del worker_status[pid]
+
+def _all_workers(live_pids, resource: str, state: str) -> bool:
+    return bool(live_pids) and all(
+        pid in worker_status and worker_status[pid][resource]["status"] == state for pid in live_pids
+    )
+
+@app.get("/health/ready")
+async def api_readiness(response: Response):
+    """
+    Readiness probe: reports which models every worker has loaded. The API
+    is ready (200) once spaCy is loaded in all workers, so the preprocessing
+    endpoints can serve while GloVe is still loading; otherwise it answers
+    503. The state is kept in the API process, so a busy but healthy API
+    stays ready; workers are only asked while some are still loading.
+    """
+    final_states = ("loaded", "failed")
+    live_pids = executor.worker_pids()
+    settled = bool(live_pids) and all(
+        pid in worker_status and all(info["status"] in final_states for info in worker_status[pid].values())
+        for pid in live_pids
+    )
+    if not settled:
+        await _refresh_worker_status()
+        live_pids = executor.worker_pids()
+    ready = _all_workers(live_pids, "preprocessing", "loaded")
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "glove_ready": _all_workers(live_pids, "glove", "loaded"),
+        "workers": [
+            {"pid": pid, "resources": worker_status.get(pid)} for pid in sorted(live_pids)
+        ],
+    }
+
 @app.post("/tokenize",response_model = List[str])
-def api_tokenize(payload: TextIn):
+async def api_tokenize(payload: TextIn):
     '''
     Tokenize the given text and return it as a list. 
     '''
@@ -98,8 +328,10 @@ def api_tokenize(payload: TextIn):
         )
     try:
         logger.info(f"Tokenizing text: '{input_string[:5]}....'")
-        tokenized_text = preprocessor.tokenize(input_string)
+        tokenized_text = (await run_cpu(workers.analyze, input_string, ("tokens",)))["tokens"]
         return tokenized_text
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during tokenization for input"
         f"'{input_string[:5]}...': {e}", exc_info=True)
@@ -113,7 +345,7 @@ def api_tokenize(payload: TextIn):
    
 
 @app.post("/lemmatize",response_model = List[LemmaOut])
-def api_lemmatize(payload:TextIn):
+async def api_lemmatize(payload:TextIn):
     '''
     Lemmatize the given text and return it as a list of dictionary
     '''
@@ -125,8 +357,10 @@ def api_lemmatize(payload:TextIn):
         )
     try:
         logger.info(f"Tokenizing text: '{input_string[:5]}....'")
-        lemmatize_text = preprocessor.lemmatize(input_string)
+        lemmatize_text = (await run_cpu(workers.analyze, input_string, ("lemmas",)))["lemmas"]
         return lemmatize_text
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during lemmatization for input"
         f"'{input_string[:5]}...': {e}", exc_info=True)
@@ -138,7 +372,7 @@ def api_lemmatize(payload:TextIn):
 
 
 @app.post("/stem", response_model = List[StemOut])
-def api_stemming(payload:TextIn):
+async def api_stemming(payload:TextIn):
     '''
     Stems the payload(input data) and returns it as list of dictionary
     '''
@@ -151,8 +385,10 @@ def api_stemming(payload:TextIn):
         )
     try:
         logger.info(f"Tokenizing text: '{input_string[:5]}....'")
-        stemmed_text = preprocessor.stem(input_string)
+        stemmed_text = (await run_cpu(workers.analyze, input_string, ("stems",)))["stems"]
         return stemmed_text
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during stemming for input"
         f"'{input_string[:5]}...': {e}", exc_info=True)
@@ -164,7 +400,7 @@ def api_stemming(payload:TextIn):
 
 
 @app.post("/pos_tag",response_model=List[PosTag])
-def api_postag(payload:TextIn):
+async def api_postag(payload:TextIn):
     '''
     Returns the tags of payload as List of dictionary
     '''
@@ -176,8 +412,10 @@ def api_postag(payload:TextIn):
         )
     try:
         logger.info(f"Tokenizing text: '{input_string[:5]}....'")
-        postag_list = preprocessor.pos_tagging(input_string)
+        postag_list = (await run_cpu(workers.analyze, input_string, ("pos_tags",)))["pos_tags"]
         return postag_list
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during postaggin for input"
         f"'{input_string[:5]}...': {e}", exc_info=True)
@@ -189,7 +427,7 @@ def api_postag(payload:TextIn):
 
 
 @app.post("/ner",response_model=List[NER])
-def api_ner(payload:TextIn):
+async def api_ner(payload:TextIn):
     '''
     Returns the Name ,Enities for given payload(text)
     '''
@@ -201,8 +439,10 @@ def api_ner(payload:TextIn):
         )
     try:
         logger.info(f"Tokenizing text: '{input_string[:5]}....'")
-        ner = preprocessor.ner(input_string)
+        ner = (await run_cpu(workers.analyze, input_string, ("named_entities",)))["named_entities"]
         return ner
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during Name Entity Recognition for input"
         f"'{input_string[:5]}...': {e}", exc_info=True)
@@ -214,10 +454,18 @@ def api_ner(payload:TextIn):
 
 
 @app.post("/process/all",response_model= AllNlpResults)
-def api_process_all(payload:TextIn):
+async def api_process_all(
+    payload:TextIn,
+    request: Request,
+    output_format: Literal["objects", "columns"] = Query("objects", alias="format"),
+):
 
     '''
-    Performs all the NLP preprocessing
+    Performs all the NLP preprocessing.
+    With ?format=columns the result uses the compact columnar layout
+    (parallel arrays aligned with "tokens", POS tags and entity labels as
+    indices into "tables"), encoded as JSON or, for
+    Accept: application/msgpack, as MessagePack.
     '''
     input_string = payload.text.strip()
 
@@ -229,21 +477,16 @@ def api_process_all(payload:TextIn):
 
     try:
         logger.info(f"Preprocessing text: '{input_string[:5]}....'")
-        tokens = preprocessor.tokenize(input_string)
-        lemmas = preprocessor.lemmatize(input_string)
-        stems = preprocessor.stem(input_string)
-        pos_tags = preprocessor.pos_tagging(input_string)
-        named_entities = preprocessor.ner(input_string)
-
-        return AllNlpResults(
-            original_text=input_string,
-            tokens = tokens,
-            lemmas = lemmas,
-            stems = stems,
-            pos_tags = pos_tags,
-            named_entities = named_entities
-        )
+        # Parse once and build every output from the same spaCy Doc
+        if output_format == "columns":
+            results = await run_cpu(workers.analyze_columns, input_string, TASKS)
+            return encode_response({"original_text": input_string, **results}, request.headers.get("accept"))
+        results = await run_cpu(workers.analyze, input_string, TASKS)
+
+        return AllNlpResults(original_text=input_string, **results)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during preprocessing for input"
         f"'{input_string[:5]}...': {e}", exc_info=True)
@@ -254,48 +497,411 @@ def api_process_all(payload:TextIn):
         )  
 
 @app.get("/embedding/{word_input}", response_model=EmbeddingOut) 
-def api_get_single_embedding(word_input: str):
+async def api_get_single_embedding(word_input: str, fallback: bool = False):
     """
     Returns the GloVe embedding for a single input word.
+    With fallback=true an unknown word gets the average of the vectors of
+    its closest spellings in the vocabulary (see oov_index.py), listed in
+    similar_words.
     """
-    if glove_model is None or not glove_model.embeddings_index: 
-        raise HTTPException(status_code=503, detail="GloVe model is not available.")
-
     processed_word = word_input.strip().lower()
     if not processed_word:
         raise HTTPException(status_code=400, detail="Input word cannot be empty.")
 
-    embedding_vector_np = glove_model.get_embedding(processed_word) 
+    embedding_vector = await run_cpu(workers.embedding, processed_word)
+
+    if embedding_vector is not None:
+        return EmbeddingOut(word=processed_word, embeddings=embedding_vector, found=True)
+    if fallback:
+        embedding_vector, similar_words = await run_cpu(workers.oov_embedding, processed_word)
+        if embedding_vector is not None:
+            return EmbeddingOut(word=processed_word, embeddings=embedding_vector, found=False, similar_words=similar_words)
+    return EmbeddingOut(word=processed_word, found=False)
+
+@app.post("/embedding/batch", response_model=EmbeddingsBatchOut)
+async def api_get_embeddings_batch(payload: WordsIn, request: Request):
+    """
+    Returns the GloVe embeddings of many words (lowercased) in one call as
+    a binary float32 block with one row per word, zeros for missing words:
+    base64 in JSON by default, or with Accept: application/octet-stream the
+    raw bytes after a found mask (see serialization.masked_float32_response).
+    embedding_client.py decodes both into NumPy without copying.
+    """
+    if not payload.words:
+        raise HTTPException(status_code=400, detail="Input words cannot be empty.")
+    words = [word.strip().lower() for word in payload.words]
+    try:
+        matrix, found = await run_cpu(workers.embeddings_batch, words)
+        if wants_octet_stream(request.headers.get("accept")):
+            return masked_float32_response(found, matrix)
+        return encode_response({
+            "dim": matrix.shape[1],
+            "found": found.tolist(),
+            "vectors": base64.b64encode(np.ascontiguousarray(matrix, dtype="<f4")).decode("ascii"),
+        }, request.headers.get("accept"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting embeddings of {len(words)} words: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error retrieving embeddings.")
+
+
+@app.post("/embedding/documents", response_model=DocumentEmbeddingsOut)
+async def api_document_embeddings(payload: DocumentsIn, request: Request):
+    """
+    Returns one vector per document: the texts are tokenized with spaCy and
+    the GloVe vectors of their tokens are averaged (weighting "mean"),
+    weighted by TF-IDF over the submitted documents ("tfidf") or by smooth
+    inverse frequency ("sif"). Tokens not in the vocabulary are skipped;
+    a document without known tokens gets a zero vector.
+    With Accept: application/octet-stream the vectors are sent as raw
+    float32 bytes followed by the known token counts as int32 (see
+    serialization.counted_float32_response).
+    """
+    if not payload.texts:
+        raise HTTPException(status_code=400, detail="Input texts cannot be empty.")
+    try:
+        logger.info(f"Embedding {len(payload.texts)} documents ({payload.weighting})")
+        vectors, known, token_counts = await run_cpu(
+            workers.document_embeddings, payload.texts, payload.weighting, payload.batch_size
+        )
+        if wants_octet_stream(request.headers.get("accept")):
+            return counted_float32_response(vectors, known)
+        return encode_response({
+            "weighting": payload.weighting,
+            "dim": vectors.shape[1],
+            "documents": [
+                {"vector": vector, "tokens": tokens, "known_tokens": known_tokens}
+                for vector, tokens, known_tokens in zip(vectors.tolist(), token_counts, known)
+            ],
+        }, request.headers.get("accept"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error embedding {len(payload.texts)} documents: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected error occured during document embedding.")
 
-    if embedding_vector_np is not None:
-        return EmbeddingOut(word=processed_word, embedding=embedding_vector_np.tolist(), found=True)
-    else:
-        return EmbeddingOut(word=processed_word, found=False)
 
 @app.get("/nearest-neighbors/{query_word_input}", response_model=List[NeighborsOut]) 
-def api_get_all_nearest_neighbors(query_word_input: str, top_n: int = 5):
+async def api_get_all_nearest_neighbors(response: Response, query_word_input: str, top_n: int = Query(5, ge=1, le=1000),
+                                        backend: str = "exact", fallback: bool = False):
     """
     Returns the top_n nearest neighbors for a given word from the GloVe vocabulary.
+    backend selects exact search or a loaded approximate index ("hnsw", "ivf_flat").
+    With fallback=true an unknown word is replaced by its closest spelling
+    in the vocabulary (see oov_index.py), which is returned in the
+    X-Resolved-Word header.
     """
-    if glove_model is None or not glove_model.embeddings_index: 
-        raise HTTPException(status_code=503, detail="GloVe model is not available.")
-
     processed_word = query_word_input.strip().lower() 
     if not processed_word:
         raise HTTPException(status_code=400, detail="Input word cannot be empty.")
 
     try:
         
-        neighbor_tuples = glove_model.get_nearest_neighbors(
-            processed_word, 
-            top_n
-        )
+        found, neighbor_tuples = (await _cached_neighbors([processed_word], top_n, backend))[0]
+        if not found and fallback:
+            resolved_word, neighbor_tuples = await run_cpu(workers.oov_nearest_neighbors, processed_word, top_n, backend)
+            if resolved_word is not None:
+                logger.info(f"Unknown word '{processed_word}' resolved to '{resolved_word}'")
+                response.headers["X-Resolved-Word"] = resolved_word
+                neighbor_cache.put(resolved_word, top_n, backend, neighbor_tuples)
 
         response_payload = []
         for neighbor_word, sim_score_val in neighbor_tuples: 
             response_payload.append(NeighborsOut(word=neighbor_word, similarity=sim_score_val))
         return response_payload
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting nearest neighbors for '{processed_word}': {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Error finding nearest neighbors.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error finding nearest neighbors.")
+
+
+@app.post("/nearest-neighbors/batch", response_model=List[NeighborsQueryOut])
+async def api_get_nearest_neighbors_batch(payload: NeighborsBatchIn):
+    """
+    Answers many nearest-neighbor queries in one call: a list of words and a
+    list of (a, b, c) analogy triples, answered as a - b + c. Results are
+    returned for the words first, then for the analogies, in input order.
+    """
+    words = [word.strip().lower() for word in payload.words]
+    analogies = [tuple(word.strip().lower() for word in triple) for triple in payload.analogies]
+    if not words and not analogies:
+        raise HTTPException(status_code=400, detail="Provide at least one word or analogy.")
+
+    try:
+        logger.info(f"Batch nearest neighbors for {len(words)} words and {len(analogies)} analogies")
+        word_results = await _cached_neighbors(words, payload.top_n, payload.backend)
+        analogy_results = await run_cpu(workers.analogies, analogies, payload.top_n, payload.backend) if analogies else []
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting batch nearest neighbors: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error finding nearest neighbors.")
+
+    queries = words + [f"{a} - {b} + {c}" for a, b, c in analogies]
+    return [
+        NeighborsQueryOut(
+            query=query,
+            found=is_found,
+            neighbors=[NeighborsOut(word=w, similarity=score) for w, score in neighbor_tuples]
+        )
+        for query, (is_found, neighbor_tuples) in zip(queries, word_results + analogy_results)
+    ]
+
+
+@app.get("/cache/stats")
+async def api_cache_stats():
+    """
+    Returns hit/miss counters and the size of the nearest-neighbor cache,
+    and of the stem and doc caches as seen by the worker that answered.
+    """
+    return {
+        "neighbors": neighbor_cache.stats(),
+        **await run_cpu(workers.cache_stats),
+    }
+
+
+@app.get("/metrics")
+async def api_metrics():
+    """
+    Prometheus metrics: request latency by endpoint and stage latency by
+    endpoint and stage (spacy_parse, doc_cache, stemming, glove_lookup,
+    neighbor_search, queue, serialization).
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/executor/stats")
+async def api_executor_stats():
+    """
+    Returns the worker pool's load: calls in progress, queued and rejected.
+    """
+    return executor.stats()
+
+
+async def _run_batch(payload: BatchTextIn, tasks, task_name: str, worker_fn=workers.analyze_batch):
+    '''
+    Validates a batch request and runs it through Preprocessing.analyze_batch
+    (or worker_fn). Results are returned in the same order as payload.texts.
+    '''
+    if not payload.texts:
+        raise HTTPException(status_code=400, detail="Input texts cannot be empty.")
+
+    input_strings = [text.strip() for text in payload.texts]
+    empty_positions = [i for i, text in enumerate(input_strings) if not text]
+    if empty_positions:
+        raise HTTPException(
+            status_code = 400,
+            detail = f"Input text cannot be empty or just whitespace (positions {empty_positions[:10]})."
+        )
+    n_process = min(payload.n_process, NLP_BATCH_MAX_PROCESSES)
+
+    try:
+        logger.info(f"Running {task_name} on a batch of {len(input_strings)} documents "
+        f"(batch_size={payload.batch_size}, n_process={n_process})")
+        results = await run_cpu(
+            worker_fn,
+            input_strings,
+            tasks,
+            payload.batch_size,
+            n_process
+        )
+        return input_strings, results
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during batch {task_name} of {len(input_strings)} documents: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail= f"An unexpected error occured during batch {task_name}."
+        )
+
+
+@app.post("/tokenize/batch", response_model = List[List[str]])
+async def api_tokenize_batch(payload: BatchTextIn):
+    '''
+    Tokenize every text in the batch and return one token list per text.
+    '''
+    _, results = await _run_batch(payload, ("tokens",), "tokenization")
+    return [result["tokens"] for result in results]
+
+
+@app.post("/lemmatize/batch", response_model = List[List[LemmaOut]])
+async def api_lemmatize_batch(payload: BatchTextIn):
+    '''
+    Lemmatize every text in the batch.
+    '''
+    _, results = await _run_batch(payload, ("lemmas",), "lemmatization")
+    return [result["lemmas"] for result in results]
+
+
+@app.post("/stem/batch", response_model = List[List[StemOut]])
+async def api_stemming_batch(payload: BatchTextIn):
+    '''
+    Stems every text in the batch.
+    '''
+    _, results = await _run_batch(payload, ("stems",), "stemming")
+    return [result["stems"] for result in results]
+
+
+@app.post("/pos_tag/batch", response_model = List[List[PosTag]])
+async def api_postag_batch(payload: BatchTextIn):
+    '''
+    Returns the pos tags of every text in the batch.
+    '''
+    _, results = await _run_batch(payload, ("pos_tags",), "postagging")
+    return [result["pos_tags"] for result in results]
+
+
+@app.post("/ner/batch", response_model = List[List[NER]])
+async def api_ner_batch(payload: BatchTextIn):
+    '''
+    Returns the named entities of every text in the batch.
+    '''
+    _, results = await _run_batch(payload, ("named_entities",), "Name Entity Recognition")
+    return [result["named_entities"] for result in results]
+
+
+@app.post("/process/all/batch", response_model = List[AllNlpResults])
+async def api_process_all_batch(
+    payload: BatchTextIn,
+    request: Request,
+    output_format: Literal["objects", "columns"] = Query("objects", alias="format"),
+):
+    '''
+    Performs all the NLP preprocessing on every text in the batch.
+    With ?format=columns the response is {"tables": ..., "documents": [...]}
+    in the compact columnar layout of /process/all, with one set of tables
+    for the whole batch.
+    '''
+    if output_format == "columns":
+        input_strings, results = await _run_batch(
+            payload, TASKS, "preprocessing", worker_fn=workers.analyze_batch_columns
+        )
+        for text, document in zip(input_strings, results["documents"]):
+            document["original_text"] = text
+        return encode_response(results, request.headers.get("accept"))
+    input_strings, results = await _run_batch(payload, TASKS, "preprocessing")
+    return [
+        AllNlpResults(original_text=text, **result)
+        for text, result in zip(input_strings, results)
+    ]
+
+
+# Wait between retries when a stream finds the executor full, and how long
+# a batch may wait in total before its documents are reported as failed
+STREAM_RETRY_SECONDS = 0.5
+STREAM_MAX_WAIT_SECONDS = float(os.environ.get("STREAM_MAX_WAIT_SECONDS", "300"))
+
+async def _run_with_backpressure(client_gone, fn, *args):
+    '''
+    Like run_cpu, but waits for room on the executor instead of failing:
+    a bulk stream should slow down under load, not abort half way. Gives
+    up with Overloaded after STREAM_MAX_WAIT_SECONDS, and with
+    ClientDisconnect once client_gone() reports the client has left.
+    Stage timings are recorded for the /process/stream endpoint.
+    '''
+    deadline = time.monotonic() + STREAM_MAX_WAIT_SECONDS
+    while True:
+        try:
+            result, stages = await _instrumented_run(fn, *args)
+            instrumentation.observe_stages("/process/stream", stages)
+            return result
+        except Overloaded:
+            if await client_gone():
+                raise ClientDisconnect()
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(STREAM_RETRY_SECONDS)
+
+
+async def _process_stream_batch(batch, batch_size: int, client_gone) -> str:
+    '''
+    Runs the valid documents of one NDJSON batch through nlp.pipe and
+    returns the batch's NDJSON output lines, in input order.
+    '''
+    outputs = []
+    texts = []
+    for line_number, value in batch:
+        output = {"line": line_number}
+        if isinstance(value, dict) and "id" in value:
+            output["id"] = value["id"]
+        if isinstance(value, Exception):
+            output["error"] = str(value)
+        elif not isinstance(value, dict) or not isinstance(value.get("text"), str):
+            output["error"] = 'Each line must be a JSON object with a "text" string.'
+        elif not value["text"].strip():
+            output["error"] = "Input text cannot be empty or just whitespace."
+        else:
+            output["original_text"] = value["text"].strip()
+            texts.append(output["original_text"])
+        outputs.append(output)
+
+    if texts:
+        results = None
+        try:
+            results = iter(await _run_with_backpressure(
+                client_gone, workers.analyze_batch, texts, TASKS, batch_size, 1
+            ))
+        except ClientDisconnect:
+            raise
+        except Overloaded as e:
+            logger.warning(f"Gave up on {len(texts)} streamed documents after {STREAM_MAX_WAIT_SECONDS:.0f}s: {e}")
+            error = str(e)
+        except Exception as e:
+            logger.error(f"Error during streamed preprocessing of {len(texts)} documents: {e}", exc_info=True)
+            error = "An unexpected error occured during preprocessing."
+        for output in outputs:
+            if "original_text" not in output:
+                continue
+            if results is None:
+                del output["original_text"]
+                output["error"] = error
+            else:
+                output.update(next(results))
+    return "".join(json.dumps(output) + "\n" for output in outputs)
+
+
+@app.post("/process/stream")
+async def api_process_stream(request: Request, batch_size: int = Query(64, ge=1, le=10000)):
+    '''
+    Performs all the NLP preprocessing on a corpus uploaded as NDJSON, one
+    {"text": ..., "id": ...} object per line ("id" is optional). Documents
+    are processed batch_size at a time with nlp.pipe while the next batch is
+    read, and every result is streamed back as an NDJSON line as soon as its
+    batch is done:
+        {"line": 0, "id": ..., "original_text": ..., "tokens": [...], ...}
+    Invalid lines give {"line": n, "error": "..."} and do not stop the stream.
+    Memory use stays flat whatever the size of the upload.
+    '''
+    logger.info(f"Streaming preprocessing started (batch_size={batch_size})")
+
+    body_read = asyncio.Event()
+
+    async def client_gone() -> bool:
+        # While the body is being read, receive() also returns body chunks,
+        # and the body reader raises ClientDisconnect itself; only poll for
+        # a disconnect once the whole body has been read
+        return body_read.is_set() and await request.is_disconnected()
+
+    async def result_lines():
+        pending = None
+        try:
+            async for batch in iter_ndjson_batches(request.stream(), batch_size):
+                task = asyncio.ensure_future(_process_stream_batch(batch, batch_size, client_gone))
+                if pending is not None:
+                    yield await pending
+                pending = task
+            body_read.set()
+            if pending is not None:
+                yield await pending
+        except ClientDisconnect:
+            logger.info("Streaming preprocessing stopped: the client disconnected")
+        finally:
+            # Don't leave a batch waiting for the executor for a client that has gone
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    return NDJSONStreamingResponse(result_lines())
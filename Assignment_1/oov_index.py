@@ -0,0 +1,147 @@
+'''
+Character n-gram index over the GloVe vocabulary, for words that are not in
+it (typos, rare inflections).
+
+Every vocabulary word is split into character n-grams of its padded form
+("<word>" gives "<wo", "wor", "ord", "rd>" for n=3), and an inverted index
+maps each n-gram to the rows of the words containing it. An unknown word is
+looked up by gathering the posting lists of its n-grams and scoring the
+candidates by Dice similarity of their n-gram sets,
+    2 * shared / (n-grams of the query + n-grams of the candidate)
+which takes a handful of array operations instead of a vocabulary scan.
+
+Build and persist the index once, then load it at startup:
+
+    python oov_index.py glove.6B.300d.npy
+    python oov_index.py glove.6B.300d.npy --max-words 100000 --query langauge
+'''
+import argparse
+import os
+import time
+from typing import List, Set, Tuple
+
+import numpy as np
+
+NGRAM_SIZE = 3
+# Candidates less similar than this are not considered a spelling of the query
+MIN_SIMILARITY = 0.4
+
+
+def oov_index_path(prefix:str) -> str:
+    '''
+    Default location of the index next to a GloVe store, e.g.
+    glove.6B.300d.ngrams.npz
+    '''
+    return f"{prefix}.ngrams.npz"
+
+
+def word_ngrams(word:str, n:int = NGRAM_SIZE) -> Set[str]:
+    padded = f"<{word}>"
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NgramIndex:
+    def __init__(self, ngrams, indptr, indices, ngram_counts, n:int = NGRAM_SIZE):
+        '''
+        Posting lists in CSR form: the vocabulary rows containing ngrams[i]
+        are indices[indptr[i]:indptr[i + 1]]. ngram_counts[row] is the
+        number of distinct n-grams of the word at row. Use build or load.
+        '''
+        self.ngrams = ngrams
+        self.indptr = indptr
+        self.indices = indices
+        self.ngram_counts = ngram_counts
+        self.n = n
+        self._ngram_ids = {ngram: i for i, ngram in enumerate(ngrams.tolist())}
+
+    def __len__(self) -> int:
+        '''
+        Number of vocabulary words covered (the first rows of the vocabulary).
+        '''
+        return len(self.ngram_counts)
+
+    @classmethod
+    def build(cls, words:List[str], n:int = NGRAM_SIZE, max_words:int | None = None) -> "NgramIndex":
+        '''
+        Indexes the first max_words words (all by default). GloVe lists
+        words from most to least frequent, so a limit keeps the index and
+        its posting lists small while covering the words people mean.
+        '''
+        words = words[:max_words] if max_words else words
+        postings = {}
+        ngram_counts = np.empty(len(words), dtype=np.int32)
+        for row, word in enumerate(words):
+            ngrams = word_ngrams(word, n)
+            ngram_counts[row] = len(ngrams)
+            for ngram in ngrams:
+                postings.setdefault(ngram, []).append(row)
+        ngrams = sorted(postings)
+        lengths = np.array([len(postings[ngram]) for ngram in ngrams], dtype=np.int64)
+        indptr = np.zeros(len(ngrams) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        for i, ngram in enumerate(ngrams):
+            indices[indptr[i]:indptr[i + 1]] = postings[ngram]
+        return cls(np.array(ngrams), indptr, indices, ngram_counts, n)
+
+    def save(self, path:str):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                ngrams=self.ngrams,
+                indptr=self.indptr,
+                indices=self.indices,
+                ngram_counts=self.ngram_counts,
+                n=np.array(self.n),
+            )
+
+    @classmethod
+    def load(cls, path:str) -> "NgramIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["ngrams"], data["indptr"], data["indices"], data["ngram_counts"], int(data["n"]))
+
+    def search(self, word:str, top_n:int = 5, min_similarity:float = MIN_SIMILARITY) -> List[Tuple[int, float]]:
+        '''
+        Returns up to top_n (row, similarity) pairs of the indexed words
+        spelled most like word, best first. Equal similarities are ordered
+        by row, i.e. more frequent words first.
+        '''
+        ngrams = word_ngrams(word, self.n)
+        ids = [self._ngram_ids[ngram] for ngram in ngrams if ngram in self._ngram_ids]
+        if not ids:
+            return []
+        postings = np.concatenate([self.indices[self.indptr[i]:self.indptr[i + 1]] for i in ids])
+        rows, shared = np.unique(postings, return_counts=True)
+        similarities = 2.0 * shared / (len(ngrams) + self.ngram_counts[rows])
+        keep = similarities >= min_similarity
+        rows, similarities = rows[keep], similarities[keep]
+        order = np.lexsort((rows, -similarities))[:top_n]
+        return [(int(rows[i]), float(similarities[i])) for i in order]
+
+
+def main():
+    from embeddings import Glove
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("glove_path", help="GloVe text file or binary store (.npy)")
+    parser.add_argument("--output", help="Index path (default: next to the embeddings)")
+    parser.add_argument("--n", type=int, default=NGRAM_SIZE, help="Characters per n-gram")
+    parser.add_argument("--max-words", type=int, help="Only index the most frequent words")
+    parser.add_argument("--query", action="append", default=[], help="Words to look up afterwards (repeatable)")
+    args = parser.parse_args()
+
+    glove = Glove(args.glove_path)
+    path = args.output or oov_index_path(os.path.splitext(args.glove_path)[0])
+    start = time.perf_counter()
+    index = glove.build_oov_index(path, n=args.n, max_words=args.max_words)
+    print(f"Indexed {len(index)} words ({len(index.ngrams)} n-grams) in {time.perf_counter() - start:.1f}s -> {path}")
+    for word in args.query:
+        start = time.perf_counter()
+        spellings = glove.similar_spellings(word)
+        print(f"{word}: {spellings} ({(time.perf_counter() - start) * 1000:.2f}ms)")
+
+
+if __name__ == "__main__":
+    main()
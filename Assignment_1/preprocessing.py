@@ -1,63 +1,314 @@
 import spacy
 from nltk.stem import PorterStemmer
-class Preprocessing:
+
+from stemming import CachedStemmer
+from instrumentation import stage
+from doc_cache import DocCache
+
+# Every output that can be built from a single parsed Doc, in the order
+# /process/all reports them.
+TASKS = ("tokens", "lemmas", "stems", "pos_tags", "named_entities")
+
+# spaCy components each task reads from. Tokens and stems only need the
+# tokenizer; the parser is never needed. Shared embedding layers (tok2vec)
+# are added automatically when a listed component listens to them.
+TASK_COMPONENTS = {
+    "tokens": (),
+    "stems": (),
+    "lemmas": ("tagger", "attribute_ruler", "lemmatizer"),
+    "pos_tags": ("tagger", "attribute_ruler"),
+    "named_entities": ("ner",),
+}
+
+class StringTable:
+    '''
+    Interns strings for the columnar output: every distinct value is stored
+    once and the columns refer to it by its index.
+    '''
     def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def index(self, value:str) -> int:
+        position = self._index.get(value)
+        if position is None:
+            position = self._index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+
+class Preprocessing:
+    def __init__(self, stem_cache_size:int = 100000, stem_table_path:str | None = None,
+                 doc_cache_path:str | None = None, doc_cache_max_bytes:int = 1024 * 2**20):
         '''
-        Takes the input string to pre-process
+        Takes the input string to pre-process. Stems are memoised in an LRU
+        cache of stem_cache_size words, backed by an optional precomputed
+        stem table (see stemming.py). With doc_cache_path, parsed Docs are
+        also kept on disk and reused for texts seen before (see doc_cache.py).
         '''
-        self.stemmer = PorterStemmer()
+        self.stemmer = CachedStemmer(PorterStemmer(), maxsize=stem_cache_size, table_path=stem_table_path)
         self.nlp = spacy.load("en_core_web_sm")
-    
+        self._builders = {
+            "tokens": self._doc_tokens,
+            "lemmas": self._doc_lemmas,
+            "stems": self._doc_stems,
+            "pos_tags": self._doc_pos_tags,
+            "named_entities": self._doc_ner,
+        }
+        self._disabled_cache = {}
+        self._model_keys = {}
+        self.doc_cache = DocCache(doc_cache_path, doc_cache_max_bytes) if doc_cache_path else None
+
+    def analyze(self, text:str, tasks=TASKS):
+        '''
+        Parses the text with spaCy once and builds every requested output
+        from the same Doc. Returns a dictionary keyed by task name.
+        '''
+        self._check_tasks(tasks)
+        doc = self._parse(text, tasks)
+        return self._build_results(doc, tasks)
+
+    def analyze_batch(self, texts, tasks=TASKS, batch_size:int = 64, n_process:int = 1):
+        '''
+        Streams many texts through nlp.pipe and returns one result dictionary
+        per text, in the same order as the input.
+        '''
+        self._check_tasks(tasks)
+        docs = self._parse_batch(texts, tasks, batch_size, n_process)
+        return [self._build_results(doc, tasks) for doc in docs]
+
+    def analyze_columns(self, text:str, tasks=TASKS):
+        '''
+        Like analyze, but returns the compact columnar layout: parallel
+        arrays per field and the POS tag / entity label tables sent once
+        (see _build_columns).
+        '''
+        self._check_tasks(tasks)
+        doc = self._parse(text, tasks)
+        tables = self._new_tables()
+        columns = self._build_columns(doc, tasks, tables)
+        return {"tables": self._tables_out(tables), **columns}
+
+    def analyze_batch_columns(self, texts, tasks=TASKS, batch_size:int = 64, n_process:int = 1):
+        '''
+        Like analyze_batch, in the columnar layout. One set of tables is
+        shared by every document of the batch.
+        '''
+        self._check_tasks(tasks)
+        docs = self._parse_batch(texts, tasks, batch_size, n_process)
+        tables = self._new_tables()
+        documents = [self._build_columns(doc, tasks, tables) for doc in docs]
+        return {"tables": self._tables_out(tables), "documents": documents}
+
+    def _parse(self, text:str, tasks):
+        if self.doc_cache is not None:
+            return list(self._parse_cached([text], tasks, batch_size=1, n_process=1))[0]
+        with stage("spacy_parse"):
+            return self.nlp(text, disable=self._disabled_components(tasks))
+
+    def _parse_batch(self, texts, tasks, batch_size:int, n_process:int):
+        '''
+        Lazily yields the parsed Doc of every text, in order.
+        '''
+        if self.doc_cache is not None:
+            return self._parse_cached(texts, tasks, batch_size, n_process)
+        return self._timed_docs(self.nlp.pipe(
+            texts,
+            batch_size=batch_size,
+            n_process=n_process,
+            disable=self._disabled_components(tasks)
+        ))
+
+    def _parse_cached(self, texts, tasks, batch_size:int, n_process:int):
+        '''
+        Like _parse_batch, reading the Docs of texts seen before from the
+        doc cache and parsing (and storing) only the others.
+        '''
+        texts = list(texts)
+        model_key = self._model_key(tasks)
+        keys = [DocCache.key(model_key, text) for text in texts]
+        with stage("doc_cache"):
+            cached = self.doc_cache.get_many(keys, self.nlp.vocab)
+        # Each distinct new text is parsed once, in order of first appearance
+        missing = list(dict.fromkeys(text for key, text in zip(keys, texts) if key not in cached))
+        parsed = self._timed_docs(self.nlp.pipe(
+            missing,
+            batch_size=batch_size,
+            n_process=n_process,
+            disable=self._disabled_components(tasks)
+        ))
+        new_docs = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                cached[key] = new_docs[key] = next(parsed)
+                if len(new_docs) >= batch_size:
+                    with stage("doc_cache"):
+                        self.doc_cache.put_many(new_docs)
+                    new_docs = {}
+            yield cached[key]
+        with stage("doc_cache"):
+            self.doc_cache.put_many(new_docs)
+
+    def _model_key(self, tasks):
+        '''
+        Identifies what a Doc parsed for the given tasks contains: the model
+        name and version and the components that ran.
+        '''
+        disabled = self._disabled_components(tasks)
+        key = tuple(disabled)
+        if key not in self._model_keys:
+            meta = self.nlp.meta
+            enabled = [name for name in self.nlp.pipe_names if name not in disabled]
+            self._model_keys[key] = (
+                f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+                f"|spacy-{spacy.__version__}|{','.join(enabled)}"
+            )
+        return self._model_keys[key]
+
+    def _timed_docs(self, docs):
+        '''
+        Passes the Docs of a lazy nlp.pipe through, timing the parsing of
+        each one as the spacy_parse stage.
+        '''
+        docs = iter(docs)
+        while True:
+            with stage("spacy_parse"):
+                doc = next(docs, None)
+            if doc is None:
+                return
+            yield doc
+
+    def _check_tasks(self, tasks):
+        unknown = [task for task in tasks if task not in self._builders]
+        if unknown:
+            raise ValueError(f"Unknown preprocessing task(s): {unknown}")
+
+    def _disabled_components(self, tasks):
+        '''
+        Returns the pipeline components that none of the given tasks need.
+        They are passed as `disable` to the spaCy call, which leaves the
+        shared pipeline untouched and is safe to use from several threads.
+        '''
+        key = frozenset(tasks)
+        if key not in self._disabled_cache:
+            needed = set()
+            for task in tasks:
+                needed.update(TASK_COMPONENTS[task])
+            # Add shared embedding layers (e.g. tok2vec) that a needed component listens to
+            for name, component in self.nlp.pipeline:
+                listeners = getattr(component, "listening_components", [])
+                if needed.intersection(listeners):
+                    needed.add(name)
+            self._disabled_cache[key] = [
+                name for name in self.nlp.pipe_names if name not in needed
+            ]
+        return self._disabled_cache[key]
+
+    def _build_results(self, doc, tasks):
+        '''
+        Builds the requested outputs from an already parsed Doc.
+        '''
+        return {task: self._builders[task](doc) for task in tasks}
+
+    def _new_tables(self):
+        return {"pos": StringTable(), "tag": StringTable(), "label": StringTable()}
+
+    def _tables_out(self, tables):
+        out = {name: table.values for name, table in tables.items()}
+        # Explanations once per tag / label instead of once per token
+        out["explanations"] = {
+            value: spacy.explain(value)
+            for value in tables["tag"].values + tables["label"].values
+        }
+        return out
+
+    def _build_columns(self, doc, tasks, tables):
+        '''
+        Columnar outputs of a parsed Doc. Token-level fields are arrays
+        aligned with "tokens", which is sent once instead of in every list;
+        POS tags and entity labels are indices into the shared tables.
+        Entity start/end are token offsets (end exclusive).
+        '''
+        columns = {}
+        if set(tasks) & {"tokens", "lemmas", "stems", "pos_tags"}:
+            columns["tokens"] = [token.text for token in doc]
+        if "lemmas" in tasks:
+            columns["lemmas"] = [token.lemma_ for token in doc]
+        if "stems" in tasks:
+            with stage("stemming"):
+                columns["stems"] = [self.stemmer.stem(token.text) for token in doc]
+        if "pos_tags" in tasks:
+            columns["pos_tags"] = {
+                "pos": [tables["pos"].index(token.pos_) for token in doc],
+                "tag": [tables["tag"].index(token.tag_) for token in doc],
+            }
+        if "named_entities" in tasks:
+            columns["named_entities"] = {
+                "text": [ent.text for ent in doc.ents],
+                "start": [ent.start for ent in doc.ents],
+                "end": [ent.end for ent in doc.ents],
+                "label": [tables["label"].index(ent.label_) for ent in doc.ents],
+            }
+        return columns
+
     def tokenize(self,text:str):
         '''
         Tokenize the given input and returns them as a list.
         '''
-        doc = self.nlp(text)
-        return [token.text for token in doc]
-    
+        return self.analyze(text, ("tokens",))["tokens"]
+
     def lemmatize(self,text:str):
         '''
         Lemmatize the given input and returns them as a list
         '''
-        # 1. Preprocess the entire text with spaCy 
-        doc = self.nlp(text)
-        # 2. Initilaize empty string. This is going to be used,
-        # while appending the list of dictionary of token and stemmed version 
-        # of token later.
-        lemma_list = []
-        for token in doc:
-            lemma_list.append({"text": token.text, "lemma": token.lemma_})
-        return lemma_list
-    
+        return self.analyze(text, ("lemmas",))["lemmas"]
+
     def stem(self,text:str):
         '''
         Perform stemming for the given input and return the stemmed
         version of text and original text in a list.
         Note: SpaCy does not support the stemming. Use NLTK for stemming purpose
         '''
-        doc = self.nlp(text) 
-        stemming_list = []
-        # Iterate through list of strings
-        for token in doc:
-            # appends list of dictionary
-            stemming_list.append({"text": token.text, "stem":self.stemmer.stem(token.text)})
-        return stemming_list
+        return self.analyze(text, ("stems",))["stems"]
 
     def pos_tagging(self,text:str):
         '''
         Perform pos_tagging for given input and returns the pos_tags
-        as a list. 
+        as a list.
         '''
-        doc = self.nlp(text)
+        return self.analyze(text, ("pos_tags",))["pos_tags"]
+
+
+    def ner(self,text:str):
+        return self.analyze(text, ("named_entities",))["named_entities"]
+
+    def _doc_tokens(self, doc):
+        return [token.text for token in doc]
+
+    def _doc_lemmas(self, doc):
+        # List of dictionary of token and lemmatized version of token
+        lemma_list = []
+        for token in doc:
+            lemma_list.append({"text": token.text, "lemma": token.lemma_})
+        return lemma_list
+
+    def _doc_stems(self, doc):
+        stemming_list = []
+        with stage("stemming"):
+            # Iterate through list of strings
+            for token in doc:
+                # appends list of dictionary
+                stemming_list.append({"text": token.text, "stem":self.stemmer.stem(token.text)})
+        return stemming_list
+
+    def _doc_pos_tags(self, doc):
         pos_tagging_list = []
         for token in doc:
             pos_tagging_list.append({ "text":token.text, "pos_tag": token.pos_,"tag":
             token.tag_,"explanation": spacy.explain(token.tag_)})
         return pos_tagging_list
-    
 
-    def ner(self,text:str):
-        doc = self.nlp(text)
+    def _doc_ner(self, doc):
         ner_list = []
         for ent in doc.ents:
             ner_list.append({"text": ent.text, "label": ent.label_, "explanation": spacy.explain(ent.label_)})
@@ -68,11 +319,12 @@ if __name__ == "__main__":
     preprocessor = Preprocessing()
     sample_text = "Apple is looking at buying U.K. startup for $1 billion. This is an example of running sentences."
 
-    print("Tokens:", preprocessor.tokenize(sample_text))
-    print("\nLemmas:", preprocessor.lemmatize(sample_text))
-    print("\nStems:", preprocessor.stem(sample_text))
-    print("\nPOS Tags:", preprocessor.pos_tagging(sample_text))
-    print("\nNER:", preprocessor.ner(sample_text)) 
+    results = preprocessor.analyze(sample_text)
+    print("Tokens:", results["tokens"])
+    print("\nLemmas:", results["lemmas"])
+    print("\nStems:", results["stems"])
+    print("\nPOS Tags:", results["pos_tags"])
+    print("\nNER:", results["named_entities"])
 
 
 
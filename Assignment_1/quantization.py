@@ -0,0 +1,151 @@
+'''
+Compact storage for the normalised GloVe search matrix.
+
+    float32  4 bytes per value, exact
+    float16  2 bytes per value
+    int8     1 byte per value plus one float32 scale per row
+             (row = scale * int8 values, scale = max(|row|) / 127)
+
+Similarity search runs on the compact matrix: rows are scored a block at a
+time, so only one block is ever widened to float32.
+
+Compare memory use and top-k agreement of the storage modes with:
+
+    python quantization.py glove.6B.300d.npy --sample-size 1000 --k 10
+'''
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+from numpy import ndarray
+
+STORAGE_TYPES = ("float32", "float16", "int8")
+# Rows widened to float32 at a time when scoring a compact matrix
+SCORE_CHUNK_ROWS = 16384
+
+
+class QuantizedMatrix:
+    def __init__(self, data:ndarray, scales:ndarray | None = None):
+        '''
+        data holds the rows in their storage dtype, scales the per-row
+        int8 scale (None for float types).
+        '''
+        self.data = data
+        self.scales = scales
+
+    @property
+    def storage(self) -> str:
+        return "int8" if self.scales is not None else str(self.data.dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @classmethod
+    def empty(cls, shape, storage:str) -> "QuantizedMatrix":
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGE_TYPES}")
+        if storage == "int8":
+            return cls(np.empty(shape, dtype=np.int8), np.empty(shape[0], dtype=np.float32))
+        return cls(np.empty(shape, dtype=storage))
+
+    def set_rows(self, start:int, rows:ndarray):
+        '''
+        Stores float32 rows starting at row `start`, quantising them if needed.
+        '''
+        end = start + len(rows)
+        if self.scales is None:
+            self.data[start:end] = rows
+            return
+        scales = np.abs(rows).max(axis=1) / 127
+        safe_scales = np.where(scales > 0, scales, 1)
+        self.data[start:end] = np.rint(rows / safe_scales[:, None]).astype(np.int8)
+        self.scales[start:end] = scales
+
+    def rows(self, indices) -> ndarray:
+        '''
+        Returns the given rows as float32.
+        '''
+        rows = self.data[indices].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[indices][..., None]
+        return rows
+
+    def dot(self, queries:ndarray) -> ndarray:
+        '''
+        Returns the (len(queries), V) float32 scores of every row against
+        float32 queries.
+        '''
+        if self.data.dtype == np.float32:
+            return queries @ self.data.T
+        scores = np.empty((len(queries), len(self.data)), dtype=np.float32)
+        for start in range(0, len(self.data), SCORE_CHUNK_ROWS):
+            block = self.data[start:start + SCORE_CHUNK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+
+def storage_report(glove_path:str, storages:List[str] = STORAGE_TYPES, sample_size:int = 1000,
+                   k:int = 10, seed:int = 0) -> Dict[str, Dict[str, float]]:
+    '''
+    Loads the embeddings once per storage mode and reports the memory held
+    in-process by the embeddings, the mean query latency and the top-k
+    agreement with float32 (share of the float32 top-k neighbours that
+    the compact mode also returns).
+    '''
+    from embeddings import Glove
+
+    report = {}
+    reference = None
+    words = None
+    for storage in storages:
+        glove = Glove(glove_path, storage=storage)
+        if words is None:
+            rng = np.random.default_rng(seed)
+            words = [glove.words[i] for i in rng.choice(len(glove), min(sample_size, len(glove)), replace=False)]
+        glove._get_search_matrix()
+
+        start = time.perf_counter()
+        neighbors = glove.get_nearest_neighbors_batch(words, k)
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = neighbors
+        hits = sum(
+            len({w for w, _ in expected}.intersection(w for w, _ in found))
+            for expected, found in zip(reference, neighbors)
+        )
+        total = sum(len(expected) for expected in reference)
+        report[storage] = {
+            "memory_mb": glove.memory_bytes() / 2**20,
+            "ms_per_query": 1000 * elapsed / len(words),
+            "top_k_agreement": hits / total if total else 0.0,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("glove_path", help="GloVe text file or binary store (.npy)")
+    parser.add_argument("--sample-size", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    report = storage_report(args.glove_path, sample_size=args.sample_size, k=args.k)
+    print(f"{'storage':<10}{'memory (MB)':>13}{'ms/query':>10}{f'top-{args.k} agreement':>20}")
+    for storage, row in report.items():
+        print(f"{storage:<10}{row['memory_mb']:>13.1f}{row['ms_per_query']:>10.2f}{row['top_k_agreement']:>20.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Encoding of the compact (columnar) responses, which skip Pydantic models.
+
+JSON is encoded with orjson when it is installed (`pip install orjson`),
+and clients that send `Accept: application/msgpack` get MessagePack
+(`pip install msgpack`). Both libraries are optional. Vector responses
+can also be sent as raw float32 bytes (`Accept: application/octet-stream`).
+'''
+import json
+from typing import Dict
+
+import numpy as np
+from fastapi import HTTPException, Response
+
+try:
+    import orjson
+except ImportError: # optional, the standard json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError: # optional, only needed for Accept: application/msgpack
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+OCTET_STREAM_MEDIA_TYPE = "application/octet-stream"
+
+
+def wants_msgpack(accept:str | None) -> bool:
+    return bool(accept) and ("msgpack" in accept)
+
+
+def wants_octet_stream(accept:str | None) -> bool:
+    return bool(accept) and (OCTET_STREAM_MEDIA_TYPE in accept)
+
+
+def masked_float32_response(found:np.ndarray, matrix:np.ndarray) -> Response:
+    '''
+    Sends a found mask and a matrix in one binary body: one byte (0 or 1)
+    per row, zero padding up to the next multiple of 4 bytes, then the
+    rows as little-endian float32. X-Shape gives the matrix shape and
+    X-Vectors-Offset where the float32 data starts, so both parts can be
+    read with np.frombuffer without copying (see embedding_client.py).
+    '''
+    mask = np.ascontiguousarray(found, dtype=np.uint8).tobytes()
+    offset = -(-len(mask) // 4) * 4
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+    return Response(
+        content=mask + bytes(offset - len(mask)) + matrix.tobytes(),
+        media_type=OCTET_STREAM_MEDIA_TYPE,
+        headers={"X-Shape": ",".join(str(n) for n in matrix.shape), "X-Vectors-Offset": str(offset)},
+    )
+
+
+def counted_float32_response(matrix:np.ndarray, counts:np.ndarray) -> Response:
+    '''
+    Sends a matrix and one count per row in one binary body: the rows as
+    little-endian float32, then the counts as little-endian int32. X-Shape
+    gives the matrix shape and X-Counts-Offset where the counts start, so
+    both parts can be read with np.frombuffer without copying (see
+    embedding_client.decode_documents_binary).
+    '''
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+    counts = np.ascontiguousarray(counts, dtype="<i4")
+    return Response(
+        content=matrix.tobytes() + counts.tobytes(),
+        media_type=OCTET_STREAM_MEDIA_TYPE,
+        headers={"X-Shape": ",".join(str(n) for n in matrix.shape), "X-Counts-Offset": str(matrix.nbytes)},
+    )
+
+
+def encode_response(content, accept:str | None = None) -> Response:
+    '''
+    Encodes plain lists / dicts / strings / numbers as MessagePack when the
+    Accept header asks for it, otherwise as JSON.
+    '''
+    if wants_msgpack(accept):
+        if msgpack is None:
+            raise HTTPException(
+                status_code=406,
+                detail="MessagePack responses need the msgpack package on the server."
+            )
+        return Response(content=msgpack.packb(content, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE)
+    if orjson is not None:
+        body = orjson.dumps(content)
+    else:
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,131 @@
+'''
+Memoised Porter stemming.
+
+NLTK's PorterStemmer is pure Python and a document repeats the same few
+hundred words over and over, so Preprocessing stems through a CachedStemmer:
+a bounded, thread-safe LRU cache in front of the stemmer, optionally backed
+by a stem table precomputed for a whole vocabulary.
+
+Build a table for the GloVe vocabulary (see convert_glove.py) once with
+    python stemming.py glove.6B.300d.vocab
+which writes glove.6B.300d.stems, and point STEM_TABLE_PATH at it.
+'''
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from nltk.stem import PorterStemmer
+
+STEM_TABLE_SUFFIX = ".stems"
+
+
+class CachedStemmer:
+    def __init__(self, stemmer=None, maxsize:int = 100000, table_path:str | None = None):
+        '''
+        Stems words with stemmer (a PorterStemmer by default), remembering
+        the stems of the maxsize most recently used words. Words found in
+        the table loaded from table_path are never stemmed nor cached.
+        '''
+        self.stemmer = stemmer or PorterStemmer()
+        self.maxsize = maxsize
+        self._table: Dict[str, str] = {}
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.table_hits = 0
+        self.hits = 0
+        self.misses = 0
+        if table_path:
+            self.load_table(table_path)
+
+    def stem(self, word:str) -> str:
+        # PorterStemmer lowercases its input, so "The" and "the" share an entry
+        key = word.lower()
+        stem = self._table.get(key)
+        if stem is not None:
+            with self._lock:
+                self.table_hits += 1
+            return stem
+        with self._lock:
+            stem = self._entries.get(key)
+            if stem is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return stem
+            self.misses += 1
+        # Stem outside the lock; two threads may stem the same word at once,
+        # which is harmless
+        stem = self.stemmer.stem(word)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = stem
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return stem
+
+    def load_table(self, path:str):
+        '''
+        Loads a stem table written by build_stem_table (word<TAB>stem lines).
+        '''
+        table = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                word, _, stem = line.rstrip("\n").partition("\t")
+                if word and stem:
+                    table[word] = stem
+        self._table = table
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.table_hits = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.table_hits + self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "table_size": len(self._table),
+                "table_hits": self.table_hits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.table_hits + self.hits) / lookups if lookups else 0.0,
+            }
+
+
+def build_stem_table(words:Iterable[str], output_path:str) -> int:
+    '''
+    Stems every distinct (lowercased) word once and writes a table that
+    CachedStemmer.load_table reads. Returns the number of entries.
+    '''
+    stemmer = PorterStemmer()
+    seen = set()
+    with open(output_path, "w", encoding="utf-8") as f:
+        for word in words:
+            key = word.strip().lower()
+            if not key or key in seen or "\t" in key:
+                continue
+            seen.add(key)
+            f.write(f"{key}\t{stemmer.stem(key)}\n")
+    return len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("vocab_path", help="Word list, one word per line (e.g. a .vocab file)")
+    parser.add_argument("--output", help=f"Stem table path (default: <vocab_path without extension>{STEM_TABLE_SUFFIX})")
+    args = parser.parse_args()
+
+    output_path = args.output or os.path.splitext(args.vocab_path)[0] + STEM_TABLE_SUFFIX
+    with open(args.vocab_path, "r", encoding="utf-8") as f:
+        count = build_stem_table(f, output_path)
+    print(f"Wrote {count} stems to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
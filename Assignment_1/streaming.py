@@ -0,0 +1,71 @@
+import asyncio
+import json
+from typing import AsyncIterator, List, Tuple
+
+from fastapi.responses import StreamingResponse
+
+# Longest accepted NDJSON line; keeps memory bounded for malformed input
+MAX_LINE_BYTES = 10 * 2**20
+
+
+async def iter_ndjson_batches(byte_stream:AsyncIterator[bytes], batch_size:int,
+                              max_line_bytes:int = MAX_LINE_BYTES) -> AsyncIterator[List[Tuple[int, object]]]:
+    '''
+    Reads newline-delimited JSON from a stream of byte chunks and yields it
+    in batches of at most batch_size (line_number, value) pairs, where value
+    is the parsed JSON or a ValueError describing why the line is invalid.
+    Blank lines are skipped. Only one partial line and one batch are held
+    in memory at a time, whatever the size of the input.
+    '''
+    buffer = b""
+    line_number = 0
+    batch = []
+    skipping_long_line = False
+
+    async for chunk in byte_stream:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        if len(buffer) > max_line_bytes:
+            # Drop the rest of an oversized line instead of buffering it
+            buffer = b""
+            skipping_long_line = True
+        for line in lines:
+            if skipping_long_line:
+                batch.append((line_number, ValueError(f"Line is longer than {max_line_bytes} bytes.")))
+                skipping_long_line = False
+            elif line.strip():
+                batch.append((line_number, _parse_line(line)))
+            line_number += 1
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+    if skipping_long_line:
+        batch.append((line_number, ValueError(f"Line is longer than {max_line_bytes} bytes.")))
+    elif buffer.strip():
+        batch.append((line_number, _parse_line(buffer)))
+    if batch:
+        yield batch
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    '''
+    StreamingResponse for results that are produced while the request body
+    is still being read.
+    '''
+    media_type = "application/x-ndjson"
+
+    async def listen_for_disconnect(self, receive):
+        # The default listener calls receive() alongside the body reader and
+        # throws away the body chunks it gets. The body reader already raises
+        # ClientDisconnect when the client goes away, so just wait here until
+        # the response is done.
+        await asyncio.Event().wait()
+
+
+def _parse_line(line:bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e: # json.JSONDecodeError and UnicodeDecodeError
+        return ValueError(f"Invalid JSON: {e}")
@@ -0,0 +1,39 @@
+import numpy as np
+
+from embeddings import Glove, convert_glove_to_binary
+
+
+def write_glove(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_binary_store_matches_text_with_duplicate_words(tmp_path):
+    text_path = write_glove(tmp_path / "dup.txt", ["a 1 0", "b 0 1", "a 0.9 0.1", "c 1 1"])
+    text_glove = Glove(text_path)
+    matrix_path, _ = convert_glove_to_binary(text_path, str(tmp_path / "dup_store"))
+    binary_glove = Glove(matrix_path)
+
+    assert binary_glove.words == text_glove.words == ["a", "b", "c"]
+    np.testing.assert_array_equal(binary_glove.get_embedding("a"), np.array([0.9, 0.1], dtype=np.float32))
+    np.testing.assert_array_equal(np.asarray(binary_glove.vectors), text_glove.vectors)
+    assert binary_glove.get_nearest_neighbors("a", 3) == text_glove.get_nearest_neighbors("a", 3)
+    assert [word for word, _ in binary_glove.get_nearest_neighbors("a", 3)] == ["c", "b"]
+
+
+def test_binary_store_memory_maps_search_matrix(tmp_path):
+    rng = np.random.default_rng(0)
+    lines = [f"w{i} " + " ".join(f"{x:.4f}" for x in rng.normal(size=8)) for i in range(200)] + ["zero " + " ".join(["0"] * 8)]
+    text_path = write_glove(tmp_path / "g.txt", lines)
+    matrix_path, _ = convert_glove_to_binary(text_path, str(tmp_path / "g_store"))
+
+    for storage in ("float32", "int8"):
+        text_glove = Glove(text_path, storage=storage)
+        binary_glove = Glove(matrix_path, storage=storage)
+        assert binary_glove.get_nearest_neighbors("w3", 10) == text_glove.get_nearest_neighbors("w3", 10)
+        assert binary_glove.get_nearest_neighbors("zero", 3) == text_glove.get_nearest_neighbors("zero", 3)
+
+    binary_glove = Glove(matrix_path)
+    np.testing.assert_array_equal(binary_glove.get_embedding("w5"), Glove(text_path).get_embedding("w5"))
+    assert isinstance(binary_glove._get_search_matrix().data, np.memmap)
+    assert binary_glove.memory_bytes() == 0
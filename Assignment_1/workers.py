@@ -0,0 +1,324 @@
+'''
+CPU-heavy work of the API. These functions run inside the worker processes
+of the API's executor (see executor.py), so every worker holds its own
+Preprocessing and Glove models. Everything here must be importable at
+module level and return plain, picklable values.
+'''
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from typing import List, Tuple
+
+from preprocessing import Preprocessing
+from embeddings import Glove
+from ann_index import INDEX_TYPES, ann_index_path
+from oov_index import oov_index_path
+from instrumentation import collect_stages, stage
+
+logger = logging.getLogger(__name__)
+
+# A text file or the .npy of a binary store, see convert_glove.py
+GLOVE_FILE_PATH = os.environ.get("GLOVE_FILE_PATH", "glove.6B.300d.txt")
+# Storage of the search matrix: float32, float16 or int8 (see quantization.py)
+GLOVE_STORAGE = os.environ.get("GLOVE_STORAGE", "float32")
+# Words whose stems each worker remembers, and an optional precomputed stem table
+STEM_CACHE_SIZE = int(os.environ.get("STEM_CACHE_SIZE", "100000"))
+STEM_TABLE_PATH = os.environ.get("STEM_TABLE_PATH") or None
+# SQLite file of parsed Docs shared by the workers (unset disables it) and its size limit
+DOC_CACHE_PATH = os.environ.get("DOC_CACHE_PATH") or None
+DOC_CACHE_MAX_MB = float(os.environ.get("DOC_CACHE_MAX_MB", "1024"))
+# Fraction of worker calls run under cProfile; profiles of calls slower than
+# PROFILE_SLOW_SECONDS are written to PROFILE_DIR (inspect with pstats/snakeviz)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", "0.5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+
+class ModelUnavailable(Exception):
+    '''
+    Raised when a model is still loading or could not be loaded in this worker.
+    '''
+
+
+class LazyResource:
+    def __init__(self, name:str, loader):
+        '''
+        A model that is loaded once, on first use or by the background
+        loader, and remembers how loading went for the health endpoints.
+        '''
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self.value = None
+        self.status = "not_loaded" # not_loaded -> loading -> loaded | failed
+        self.background = False # True once the background loader will load it
+        self.seconds = None
+        self.error = None
+
+    def load(self):
+        '''
+        Loads the resource unless that already happened. Concurrent callers
+        wait for the same load instead of starting their own.
+        '''
+        with self._lock:
+            if self.status in ("loaded", "failed"):
+                return self.value
+            self.status = "loading"
+            start = time.perf_counter()
+            try:
+                self.value = self._loader()
+                self.status = "loaded"
+            except Exception as e:
+                logger.error(f"Could not load {self.name}: {e}", exc_info=True)
+                self.error = str(e)
+                self.status = "failed"
+            self.seconds = time.perf_counter() - start
+            logger.info(f"{self.name} {self.status} in {self.seconds:.1f}s")
+        return self.value
+
+    def get(self, wait:bool = True):
+        '''
+        Returns the loaded resource, loading it now if nobody else does.
+        When it is (or will be) loaded in the background and wait is False,
+        raises ModelUnavailable at once instead of blocking the caller
+        until loading finishes.
+        '''
+        pending = self.status == "loading" or (self.status == "not_loaded" and self.background)
+        if pending and not wait:
+            raise ModelUnavailable(f"{self.name} is still loading, try again shortly.")
+        if self.status != "loaded":
+            self.load()
+        if self.status == "failed":
+            raise ModelUnavailable(f"{self.name} is not available.")
+        return self.value
+
+    def info(self) -> dict:
+        return {"status": self.status, "load_seconds": self.seconds, "error": self.error}
+
+
+def init_worker():
+    '''
+    Executor initializer: starts loading the models in the background, so a
+    worker can serve spaCy requests as soon as spaCy is loaded while GloVe
+    is still being read.
+    '''
+    start_background_loading()
+
+
+def start_background_loading():
+    global _loader_thread
+    with _loader_lock:
+        if _loader_thread is None:
+            preprocessing_resource.background = True
+            glove_resource.background = True
+            _loader_thread = threading.Thread(target=_load_all, name="model-loader", daemon=True)
+            _loader_thread.start()
+
+
+def _load_all():
+    # spaCy first: it is quick and needed by the highest-volume endpoints
+    preprocessing_resource.load()
+    glove_resource.load()
+
+
+def resource_status() -> dict:
+    '''
+    Load state of this worker's models, for the health endpoints.
+    '''
+    return {
+        "pid": os.getpid(),
+        "resources": {
+            "preprocessing": preprocessing_resource.info(),
+            "glove": glove_resource.info(),
+        },
+    }
+
+
+def get_preprocessor() -> Preprocessing:
+    return preprocessing_resource.get(wait=True)
+
+
+def get_glove() -> Glove:
+    # Never block a request for the minutes a large text file can take
+    return glove_resource.get(wait=False)
+
+
+def load_glove(file_path:str, storage:str) -> Glove:
+    '''
+    Loads the embeddings and every ANN index that was built next to them
+    (see ann_index.py).
+    '''
+    glove = Glove(file_path, storage=storage)
+    for index_type in INDEX_TYPES:
+        index_path = ann_index_path(os.path.splitext(file_path)[0], index_type)
+        if os.path.exists(index_path):
+            try:
+                glove.load_ann_index(index_path)
+                logger.info(f"Loaded {index_type} ANN index from {index_path}")
+            except Exception as e:
+                logger.error(f"Could not load ANN index {index_path}: {e}", exc_info=True)
+    index_path = oov_index_path(os.path.splitext(file_path)[0])
+    if os.path.exists(index_path):
+        try:
+            glove.load_oov_index(index_path)
+            logger.info(f"Loaded OOV n-gram index from {index_path}")
+        except Exception as e:
+            logger.error(f"Could not load OOV index {index_path}: {e}", exc_info=True)
+    if len(glove) == 0:
+        raise FileNotFoundError(f"No GloVe vectors could be loaded from {file_path}")
+    return glove
+
+
+preprocessing_resource = LazyResource(
+    "spaCy pipeline",
+    lambda: Preprocessing(
+        stem_cache_size=STEM_CACHE_SIZE,
+        stem_table_path=STEM_TABLE_PATH,
+        doc_cache_path=DOC_CACHE_PATH,
+        doc_cache_max_bytes=int(DOC_CACHE_MAX_MB * 2**20),
+    )
+)
+glove_resource = LazyResource("GloVe model", lambda: load_glove(GLOVE_FILE_PATH, GLOVE_STORAGE))
+_loader_thread = None
+_loader_lock = threading.Lock()
+
+
+def instrumented_call(fn, *args):
+    '''
+    Runs fn(*args) and returns (result, stage timings, seconds taken), see
+    instrumentation.py. A sample of the calls is profiled with cProfile.
+    '''
+    profiler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+    start = time.perf_counter()
+    with collect_stages() as stages:
+        if profiler is not None:
+            result = profiler.runcall(fn, *args)
+        else:
+            result = fn(*args)
+    seconds = time.perf_counter() - start
+    if profiler is not None and seconds >= PROFILE_SLOW_SECONDS:
+        _save_profile(profiler, fn.__name__, seconds)
+    return result, stages, seconds
+
+
+def _save_profile(profiler:cProfile.Profile, name:str, seconds:float):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}-{time.time_ns() // 1000000}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Profile of a {seconds:.3f}s {name} call written to {path}")
+    except OSError as e:
+        logger.error(f"Could not write profile of {name}: {e}")
+
+
+def analyze(text:str, tasks) -> dict:
+    return get_preprocessor().analyze(text, tasks)
+
+
+def analyze_batch(texts:List[str], tasks, batch_size:int, n_process:int) -> List[dict]:
+    return get_preprocessor().analyze_batch(texts, tasks, batch_size=batch_size, n_process=n_process)
+
+
+def analyze_columns(text:str, tasks) -> dict:
+    return get_preprocessor().analyze_columns(text, tasks)
+
+
+def analyze_batch_columns(texts:List[str], tasks, batch_size:int, n_process:int) -> dict:
+    return get_preprocessor().analyze_batch_columns(texts, tasks, batch_size=batch_size, n_process=n_process)
+
+
+def cache_stats() -> dict:
+    '''
+    Counters of this worker's stem cache (every worker has its own) and of
+    the doc cache, if enabled (shared file, per-worker hit counters).
+    '''
+    preprocessor = get_preprocessor()
+    doc_cache = preprocessor.doc_cache
+    return {
+        "stems": {"pid": os.getpid(), **preprocessor.stemmer.stats()},
+        "docs": {"pid": os.getpid(), **doc_cache.stats()} if doc_cache is not None else None,
+    }
+
+
+def embedding(word:str) -> List[float] | None:
+    glove = get_glove()
+    with stage("glove_lookup"):
+        vector = glove.get_embedding(word)
+    return vector.tolist() if vector is not None else None
+
+
+def oov_embedding(word:str) -> Tuple[List[float] | None, List[str]]:
+    '''
+    Returns (vector, spellings it was composed from) for a word that is
+    not in the vocabulary, see Glove.get_oov_embedding.
+    '''
+    glove = get_glove()
+    with stage("glove_lookup"):
+        vector, spellings = glove.get_oov_embedding(word)
+    return (vector.tolist() if vector is not None else None), [w for w, _ in spellings]
+
+
+def oov_nearest_neighbors(word:str, top_n:int, backend:str) -> Tuple[str | None, List[Tuple[str, float]]]:
+    '''
+    Returns the closest spelling of an unknown word and its neighbours,
+    or (None, []) if no vocabulary word is spelled like it.
+    '''
+    glove = get_glove()
+    with stage("glove_lookup"):
+        resolved = glove.resolve_word(word)
+    if resolved is None:
+        return None, []
+    with stage("neighbor_search"):
+        return resolved, glove.get_nearest_neighbors(resolved, top_n, backend=backend)
+
+
+def embeddings_batch(words:List[str]):
+    '''
+    Returns (float32 matrix with one row per word, found mask).
+    '''
+    glove = get_glove()
+    with stage("glove_lookup"):
+        return glove.get_embeddings(words)
+
+
+def document_embeddings(texts:List[str], weighting:str, batch_size:int):
+    '''
+    Tokenizes the texts with spaCy and aggregates their GloVe vectors.
+    Returns (float32 matrix with one row per text, known tokens per text,
+    tokens per text).
+    '''
+    glove = get_glove() # Fail fast while GloVe is still loading
+    token_lists = [
+        result["tokens"]
+        for result in get_preprocessor().analyze_batch(texts, ("tokens",), batch_size=batch_size)
+    ]
+    with stage("glove_lookup"):
+        vectors, known = glove.get_document_embeddings(token_lists, weighting)
+    return vectors, known.tolist(), [len(tokens) for tokens in token_lists]
+
+
+def nearest_neighbors_batch(words:List[str], top_n:int, backend:str) -> List[Tuple[bool, List[Tuple[str, float]]]]:
+    '''
+    Returns (found, neighbors) for every word. Raises ValueError for an
+    unknown backend.
+    '''
+    glove = get_glove()
+    with stage("neighbor_search"):
+        results = glove.get_nearest_neighbors_batch(words, top_n, backend=backend)
+    return [(word in glove.word_index, neighbors) for word, neighbors in zip(words, results)]
+
+
+def analogies(triples:List[Tuple[str, str, str]], top_n:int, backend:str) -> List[Tuple[bool, List[Tuple[str, float]]]]:
+    '''
+    Returns (found, neighbors) for every a - b + c triple.
+    '''
+    glove = get_glove()
+    with stage("neighbor_search"):
+        results = glove.get_analogies(triples, top_n, backend=backend)
+    found = [all(word in glove.word_index for word in triple) for triple in triples]
+    return list(zip(found, results))